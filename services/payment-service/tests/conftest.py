@@ -3,37 +3,106 @@ Pytest configuration and fixtures for Payment Service tests.
 """
 
 import asyncio
-from datetime import datetime, timedelta
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-from typing import AsyncGenerator, Generator
+from types import MappingProxyType
+from typing import Any, AsyncGenerator, Dict, Generator
 from unittest.mock import AsyncMock, MagicMock
 
+import orjson
 import pytest
 import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
+from .helpers import sign_momo_params, sign_vnpay_params, sign_zalopay_params
 
-# Test database and Redis fixtures
+
+def pytest_configure(config):
+    """Register optional-plugin markers."""
+    config.addinivalue_line(
+        "markers", "xdist_group(name): run tests sharing a name on one xdist worker"
+    )
+
+
+# pytest-asyncio 0.21 runs every async test and fixture on the event_loop
+# fixture, so a session-scoped override gives the whole suite one loop.
 @pytest.fixture(scope="session")
 def event_loop() -> Generator[asyncio.AbstractEventLoop, None, None]:
-    """Create an instance of the default event loop for the test session."""
-    loop = asyncio.get_event_loop_policy().new_event_loop()
+    """Create one event loop shared by the whole test session."""
+    loop = asyncio.new_event_loop()
     yield loop
     loop.close()
 
 
-@pytest_asyncio.fixture
-async def mock_db_session() -> AsyncGenerator[AsyncMock, None]:
-    """Mock database session for testing."""
+# Test database and Redis fixtures
+def _make_async_session() -> AsyncMock:
+    """Build a mock database session with awaitable and sync methods wired."""
     mock_session = AsyncMock()
     mock_session.commit = AsyncMock()
     mock_session.rollback = AsyncMock()
     mock_session.close = AsyncMock()
     mock_session.add = MagicMock()
+    mock_session.add_all = MagicMock()
     mock_session.delete = MagicMock()
-    mock_session.execute = AsyncMock()
+    mock_session.execute = AsyncMock(return_value=MagicMock())
     mock_session.scalar = AsyncMock()
     mock_session.scalars = AsyncMock()
-    yield mock_session
+    return mock_session
+
+
+@pytest.fixture(scope="session")
+def mock_db_session() -> AsyncMock:
+    """Mock database session shared across the test session."""
+    return _make_async_session()
+
+
+@pytest.fixture(autouse=True)
+def reset_mock_db_session(mock_db_session):
+    """Clear calls and configured results on the shared session before each test."""
+    mock_db_session.reset_mock(return_value=True, side_effect=True)
+    # Awaited execute() yields a synchronous Result object
+    mock_db_session.execute.return_value = MagicMock()
+
+
+def _orjson_dumps(value):
+    return orjson.dumps(value).decode()
+
+
+@pytest_asyncio.fixture(scope="session")
+async def async_engine():
+    """Pooled asyncpg engine for tests that run against a real database."""
+    db_url = os.environ.get("TEST_DB_URL")
+    if not db_url:
+        pytest.skip("TEST_DB_URL is not set")
+    pytest.importorskip("asyncpg")
+
+    # orjson handles the JSONB columns (e.g. gateway_response) instead of json
+    engine = create_async_engine(
+        db_url,
+        pool_size=10,
+        max_overflow=0,
+        json_serializer=_orjson_dumps,
+        json_deserializer=orjson.loads,
+    )
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def db_session(async_engine) -> AsyncGenerator[AsyncSession, None]:
+    """Database session rolled back after each test to keep tests isolated."""
+    async with async_engine.connect() as connection:
+        transaction = await connection.begin()
+        session = AsyncSession(
+            bind=connection, join_transaction_mode="create_savepoint"
+        )
+        try:
+            yield session
+        finally:
+            await session.close()
+            await transaction.rollback()
 
 
 @pytest_asyncio.fixture
@@ -52,87 +121,171 @@ async def mock_redis() -> AsyncGenerator[AsyncMock, None]:
 
 
 # Payment method fixtures
-@pytest.fixture
+@dataclass(frozen=True, slots=True)
+class PaymentMethod:
+    """Payment method configuration as stored in the payment_methods table."""
+
+    id: int
+    name: str
+    code: str
+    is_active: bool
+    fee_percent: Decimal
+    min_amount: Decimal
+    max_amount: Decimal
+    config: Dict[str, Any]
+
+
+@pytest.fixture(scope="session")
 def sample_payment_methods():
     """Sample payment methods for testing."""
     return [
-        {
-            "id": 1,
-            "name": "VNPay",
-            "code": "VNPAY",
-            "is_active": True,
-            "fee_percent": Decimal("2.5"),
-            "min_amount": Decimal("10000"),
-            "max_amount": Decimal("50000000"),
-            "config": {
+        PaymentMethod(
+            id=1,
+            name="VNPay",
+            code="VNPAY",
+            is_active=True,
+            fee_percent=Decimal("2.5"),
+            min_amount=Decimal("10000"),
+            max_amount=Decimal("50000000"),
+            config={
                 "tmn_code": "TEST_TMN_CODE",
                 "hash_secret": "TEST_HASH_SECRET",
                 "api_url": "https://sandbox.vnpayment.vn/paymentv2/vpcpay.html",
             },
-        },
-        {
-            "id": 2,
-            "name": "MoMo",
-            "code": "MOMO",
-            "is_active": True,
-            "fee_percent": Decimal("2.0"),
-            "min_amount": Decimal("5000"),
-            "max_amount": Decimal("20000000"),
-            "config": {
+        ),
+        PaymentMethod(
+            id=2,
+            name="MoMo",
+            code="MOMO",
+            is_active=True,
+            fee_percent=Decimal("2.0"),
+            min_amount=Decimal("5000"),
+            max_amount=Decimal("20000000"),
+            config={
                 "partner_code": "TEST_PARTNER_CODE",
                 "access_key": "TEST_ACCESS_KEY",
                 "secret_key": "TEST_SECRET_KEY",
                 "api_url": "https://test-payment.momo.vn/v2/gateway/api/create",
             },
-        },
-        {
-            "id": 3,
-            "name": "ZaloPay",
-            "code": "ZALOPAY",
-            "is_active": True,
-            "fee_percent": Decimal("1.8"),
-            "min_amount": Decimal("1000"),
-            "max_amount": Decimal("30000000"),
-            "config": {
+        ),
+        PaymentMethod(
+            id=3,
+            name="ZaloPay",
+            code="ZALOPAY",
+            is_active=True,
+            fee_percent=Decimal("1.8"),
+            min_amount=Decimal("1000"),
+            max_amount=Decimal("30000000"),
+            config={
                 "app_id": "TEST_APP_ID",
                 "key1": "TEST_KEY1",
                 "key2": "TEST_KEY2",
                 "api_url": "https://sb-openapi.zalopay.vn/v2/create",
             },
-        },
+        ),
     ]
 
 
+@pytest.fixture(scope="session")
+def payment_methods_by_code(sample_payment_methods):
+    """Active payment methods keyed by code."""
+    return {m.code: m for m in sample_payment_methods if m.is_active}
+
+
+@pytest.fixture(scope="session")
+def vnpay_method(payment_methods_by_code):
+    """VNPay payment method configuration."""
+    return payment_methods_by_code["VNPAY"]
+
+
 # Transaction fixtures
-@pytest.fixture
+@dataclass(frozen=True, slots=True)
+class FakeTxn:
+    """Read-only transaction row as returned by the database."""
+
+    id: int
+    user_id: int
+    amount: Decimal
+    status: str
+    created_at: datetime
+    payment_method: str = ""
+    description: str = ""
+    transaction_ref: str = ""
+
+
+_TXN_STATUSES = ("completed", "completed", "failed", "pending")
+
+# Fixed "current" time shared by the whole session instead of per-test clocks
+FROZEN_NOW = datetime(2024, 1, 15, 12, 0, 0, tzinfo=timezone.utc)
+
+# Built once at import: 20 rows over two users and the last 14 days
+_USER_TXNS = tuple(
+    FakeTxn(
+        id=i,
+        user_id=1 if i % 4 else 2,
+        amount=Decimal(10000 * i),
+        status=_TXN_STATUSES[i % len(_TXN_STATUSES)],
+        created_at=FROZEN_NOW - timedelta(days=i % 14, hours=1),
+    )
+    for i in range(1, 21)
+)
+
+
+@pytest.fixture(scope="session")
+def frozen_now():
+    """Fixed timezone-aware time the sample transactions are relative to."""
+    return FROZEN_NOW
+
+
+@pytest.fixture(scope="session")
+def make_txn():
+    """Factory for FakeTxn instances."""
+    return FakeTxn
+
+
+@pytest.fixture(scope="session")
+def sample_user_transactions():
+    """Sample transactions belonging to a small set of users."""
+    return _USER_TXNS
+
+
+@pytest.fixture(scope="session")
 def sample_transaction_data():
     """Sample transaction data for testing."""
-    return {
-        "user_id": 1,
-        "amount": Decimal("100000"),
-        "currency": "VND",
-        "payment_method_id": 1,
-        "description": "Nạp tiền vào tài khoản",
-        "metadata": {
-            "user_ip": "192.168.1.100",
-            "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
-            "return_url": "https://mathservice.com/payment/return",
-        },
-    }
+    return MappingProxyType(
+        {
+            "user_id": 1,
+            "amount": Decimal("100000"),
+            "currency": "VND",
+            "payment_method_id": 1,
+            "status": "pending",
+            "description": "Nạp tiền vào tài khoản",
+            "metadata": MappingProxyType(
+                {
+                    "user_ip": "192.168.1.100",
+                    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+                    "return_url": "https://mathservice.com/payment/return",
+                }
+            ),
+        }
+    )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_transaction_create_data():
     """Sample transaction creation data for testing."""
-    return {
-        "user_id": 1,
-        "amount": Decimal("50000"),
-        "currency": "VND",
-        "payment_method_code": "VNPAY",
-        "description": "Thanh toán dịch vụ giải toán",
-        "return_url": "https://mathservice.com/payment/success",
-        "cancel_url": "https://mathservice.com/payment/cancel",
-    }
+    return MappingProxyType(
+        {
+            "user_id": 1,
+            "amount": Decimal("50000"),
+            "currency": "VND",
+            "payment_method": "VNPAY",
+            "payment_method_code": "VNPAY",
+            "description": "Thanh toán dịch vụ giải toán",
+            "return_url": "https://mathservice.com/payment/success",
+            "cancel_url": "https://mathservice.com/payment/cancel",
+        }
+    )
 
 
 @pytest.fixture
@@ -151,8 +304,8 @@ def sample_successful_transaction():
             "vnp_Message": "Giao dịch thành công",
             "vnp_TransactionStatus": "00",
         },
-        "created_at": datetime.utcnow(),
-        "completed_at": datetime.utcnow(),
+        "created_at": FROZEN_NOW,
+        "completed_at": FROZEN_NOW,
     }
 
 
@@ -172,25 +325,27 @@ def sample_failed_transaction():
             "vnp_Message": "Giao dịch bị hủy",
             "vnp_TransactionStatus": "02",
         },
-        "created_at": datetime.utcnow(),
-        "failed_at": datetime.utcnow(),
+        "created_at": FROZEN_NOW,
+        "failed_at": FROZEN_NOW,
         "failure_reason": "User cancelled transaction",
     }
 
 
 # Balance fixtures
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_balance_data():
     """Sample balance data for testing."""
-    return {
-        "user_id": 1,
-        "current_balance": Decimal("500000"),
-        "total_deposited": Decimal("1000000"),
-        "total_spent": Decimal("500000"),
-        "last_transaction_date": datetime.utcnow(),
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow(),
-    }
+    return MappingProxyType(
+        {
+            "user_id": 1,
+            "current_balance": Decimal("500000"),
+            "total_deposited": Decimal("1000000"),
+            "total_spent": Decimal("500000"),
+            "last_transaction_date": FROZEN_NOW,
+            "created_at": FROZEN_NOW,
+            "updated_at": FROZEN_NOW,
+        }
+    )
 
 
 # Transaction log fixtures
@@ -207,7 +362,7 @@ def sample_transaction_log():
             "payment_url": "https://sandbox.vnpayment.vn/paymentv2/vpcpay.html?...",
             "order_id": "ORDER_123456789",
         },
-        "created_at": datetime.utcnow(),
+        "created_at": FROZEN_NOW,
     }
 
 
@@ -219,29 +374,31 @@ def mock_vnpay_responses():
         "create_payment_success": {
             "payment_url": "https://sandbox.vnpayment.vn/paymentv2/vpcpay.html?vnp_Amount=10000000&vnp_Command=pay&vnp_CreateDate=20240115103000&vnp_CurrCode=VND&vnp_IpAddr=192.168.1.100&vnp_Locale=vn&vnp_OrderInfo=Nap+tien+vao+tai+khoan&vnp_OrderType=other&vnp_ReturnUrl=https%3A%2F%2Fmathservice.com%2Fpayment%2Freturn&vnp_TmnCode=TEST_TMN_CODE&vnp_TxnRef=TXN_123456789&vnp_Version=2.1.0&vnp_SecureHash=test_secure_hash"
         },
-        "payment_return_success": {
-            "vnp_Amount": "10000000",
-            "vnp_BankCode": "NCB",
-            "vnp_BankTranNo": "VNP14123456",
-            "vnp_CardType": "ATM",
-            "vnp_OrderInfo": "Nap tien vao tai khoan",
-            "vnp_PayDate": "20240115103500",
-            "vnp_ResponseCode": "00",
-            "vnp_TmnCode": "TEST_TMN_CODE",
-            "vnp_TransactionNo": "14123456",
-            "vnp_TransactionStatus": "00",
-            "vnp_TxnRef": "TXN_123456789",
-            "vnp_SecureHash": "test_return_hash",
-        },
-        "payment_return_failed": {
-            "vnp_Amount": "10000000",
-            "vnp_OrderInfo": "Nap tien vao tai khoan",
-            "vnp_ResponseCode": "24",
-            "vnp_TmnCode": "TEST_TMN_CODE",
-            "vnp_TransactionStatus": "02",
-            "vnp_TxnRef": "TXN_123456789",
-            "vnp_SecureHash": "test_failed_hash",
-        },
+        "payment_return_success": sign_vnpay_params(
+            {
+                "vnp_Amount": "10000000",
+                "vnp_BankCode": "NCB",
+                "vnp_BankTranNo": "VNP14123456",
+                "vnp_CardType": "ATM",
+                "vnp_OrderInfo": "Nap tien vao tai khoan",
+                "vnp_PayDate": "20240115103500",
+                "vnp_ResponseCode": "00",
+                "vnp_TmnCode": "TEST_TMN_CODE",
+                "vnp_TransactionNo": "14123456",
+                "vnp_TransactionStatus": "00",
+                "vnp_TxnRef": "TXN_123456789",
+            }
+        ),
+        "payment_return_failed": sign_vnpay_params(
+            {
+                "vnp_Amount": "10000000",
+                "vnp_OrderInfo": "Nap tien vao tai khoan",
+                "vnp_ResponseCode": "24",
+                "vnp_TmnCode": "TEST_TMN_CODE",
+                "vnp_TransactionStatus": "02",
+                "vnp_TxnRef": "TXN_123456789",
+            }
+        ),
     }
 
 
@@ -261,34 +418,38 @@ def mock_momo_responses():
             "deeplink": "momo://app?action=payWithAppInApp&token=test_token",
             "qrCodeUrl": "https://test-payment.momo.vn/v2/gateway/qr?t=test_token",
         },
-        "payment_return_success": {
-            "partnerCode": "TEST_PARTNER_CODE",
-            "orderId": "ORDER_123456789",
-            "requestId": "REQ_123456789",
-            "amount": 100000,
-            "orderInfo": "Nạp tiền vào tài khoản",
-            "orderType": "momo_wallet",
-            "transId": 2147483647,
-            "resultCode": 0,
-            "message": "Successful.",
-            "payType": "qr",
-            "responseTime": 1705123456789,
-            "extraData": "",
-            "signature": "test_signature",
-        },
-        "payment_return_failed": {
-            "partnerCode": "TEST_PARTNER_CODE",
-            "orderId": "ORDER_123456789",
-            "requestId": "REQ_123456789",
-            "amount": 100000,
-            "orderInfo": "Nạp tiền vào tài khoản",
-            "orderType": "momo_wallet",
-            "resultCode": 1006,
-            "message": "Transaction is rejected by user",
-            "responseTime": 1705123456789,
-            "extraData": "",
-            "signature": "test_failed_signature",
-        },
+        "payment_return_success": sign_momo_params(
+            {
+                "partnerCode": "TEST_PARTNER_CODE",
+                "orderId": "ORDER_123456789",
+                "requestId": "REQ_123456789",
+                "amount": 100000,
+                "orderInfo": "Nạp tiền vào tài khoản",
+                "orderType": "momo_wallet",
+                "transId": 2147483647,
+                "resultCode": 0,
+                "message": "Successful.",
+                "payType": "qr",
+                "responseTime": 1705123456789,
+                "extraData": "",
+            }
+        ),
+        "payment_return_failed": sign_momo_params(
+            {
+                "partnerCode": "TEST_PARTNER_CODE",
+                "orderId": "ORDER_123456789",
+                "requestId": "REQ_123456789",
+                "amount": 100000,
+                "orderInfo": "Nạp tiền vào tài khoản",
+                "orderType": "momo_wallet",
+                "transId": 0,
+                "resultCode": 1006,
+                "message": "Transaction is rejected by user",
+                "payType": "",
+                "responseTime": 1705123456789,
+                "extraData": "",
+            }
+        ),
     }
 
 
@@ -305,16 +466,18 @@ def mock_zalopay_responses():
             "order_url": "https://sb-openapi.zalopay.vn/v2/gateway/pay?token=test_zp_trans_token",
             "order_token": "test_order_token",
         },
-        "payment_return_success": {
-            "data": "eyJhcHBfaWQiOjU1MywiYXBwX3RyYW5zX2lkIjoiT1JERVJfMTIzNDU2Nzg5IiwiYXBwX3RpbWUiOjE3MDUxMjM0NTY3ODksImFwcF91c2VyIjoidXNlcjEiLCJhbW91bnQiOjEwMDAwMCwiZW1iZWRfZGF0YSI6IntcInJldHVybl91cmxcIjpcImh0dHBzOi8vbWF0aHNlcnZpY2UuY29tL3BheW1lbnQvcmV0dXJuXCJ9IiwiaXRlbSI6IltdIiwiYmFua19jb2RlIjoiIiwicGF5bWVudF9tZXRob2QiOiIifQ==",
-            "mac": "test_mac_signature",
-            "type": 1,
-        },
-        "payment_return_failed": {
-            "data": "eyJhcHBfaWQiOjU1MywiYXBwX3RyYW5zX2lkIjoiT1JERVJfMTIzNDU2Nzg5IiwiYXBwX3RpbWUiOjE3MDUxMjM0NTY3ODksImFwcF91c2VyIjoidXNlcjEiLCJhbW91bnQiOjEwMDAwMCwiZW1iZWRfZGF0YSI6IntcInJldHVybl91cmxcIjpcImh0dHBzOi8vbWF0aHNlcnZpY2UuY29tL3BheW1lbnQvcmV0dXJuXCJ9IiwiaXRlbSI6IltdIiwiYmFua19jb2RlIjoiIiwicGF5bWVudF9tZXRob2QiOiIifQ==",
-            "mac": "test_failed_mac_signature",
-            "type": -1,
-        },
+        "payment_return_success": sign_zalopay_params(
+            {
+                "data": "eyJhcHBfaWQiOjU1MywiYXBwX3RyYW5zX2lkIjoiT1JERVJfMTIzNDU2Nzg5IiwiYXBwX3RpbWUiOjE3MDUxMjM0NTY3ODksImFwcF91c2VyIjoidXNlcjEiLCJhbW91bnQiOjEwMDAwMCwiZW1iZWRfZGF0YSI6IntcInJldHVybl91cmxcIjpcImh0dHBzOi8vbWF0aHNlcnZpY2UuY29tL3BheW1lbnQvcmV0dXJuXCJ9IiwiaXRlbSI6IltdIiwiYmFua19jb2RlIjoiIiwicGF5bWVudF9tZXRob2QiOiIifQ==",
+                "type": 1,
+            }
+        ),
+        "payment_return_failed": sign_zalopay_params(
+            {
+                "data": "eyJhcHBfaWQiOjU1MywiYXBwX3RyYW5zX2lkIjoiT1JERVJfMTIzNDU2Nzg5IiwiYXBwX3RpbWUiOjE3MDUxMjM0NTY3ODksImFwcF91c2VyIjoidXNlcjEiLCJhbW91bnQiOjEwMDAwMCwiZW1iZWRfZGF0YSI6IntcInJldHVybl91cmxcIjpcImh0dHBzOi8vbWF0aHNlcnZpY2UuY29tL3BheW1lbnQvcmV0dXJuXCJ9IiwiaXRlbSI6IltdIiwiYmFua19jb2RlIjoiIiwicGF5bWVudF9tZXRob2QiOiIifQ==",
+                "type": -1,
+            }
+        ),
     }
 
 
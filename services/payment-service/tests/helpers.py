@@ -0,0 +1,60 @@
+"""
+Gateway signing helpers shared by the Payment Service tests.
+"""
+
+import hashlib
+import hmac
+from functools import lru_cache
+
+# Fields covered by the MoMo IPN signature, in the order MoMo concatenates them
+MOMO_IPN_SIGNATURE_FIELDS = (
+    "amount",
+    "extraData",
+    "message",
+    "orderId",
+    "orderInfo",
+    "orderType",
+    "partnerCode",
+    "payType",
+    "requestId",
+    "responseTime",
+    "resultCode",
+    "transId",
+)
+
+
+@lru_cache(maxsize=None)
+def _hmac_template(secret, digestmod):
+    """Return a keyed HMAC to ``.copy()`` so key setup runs once per secret."""
+    return hmac.new(secret.encode(), digestmod=digestmod)
+
+
+def hmac_digest(secret, message, digestmod):
+    """HMAC ``message`` bytes with ``secret`` using the cached keyed template."""
+    h = _hmac_template(secret, digestmod).copy()
+    h.update(message)
+    return h.digest()
+
+
+def sign_vnpay_params(params, hash_secret="TEST_HASH_SECRET"):
+    """Attach the HMAC-SHA512 secure hash VNPay sends with return data."""
+    query_string = "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+    secure_hash = hmac_digest(hash_secret, query_string.encode(), hashlib.sha512)
+    return {**params, "vnp_SecureHash": secure_hash.hex()}
+
+
+def sign_momo_params(
+    params, access_key="TEST_ACCESS_KEY", secret_key="TEST_SECRET_KEY"
+):
+    """Attach the HMAC-SHA256 signature MoMo sends with IPN callbacks."""
+    raw_signature = f"accessKey={access_key}&" + "&".join(
+        f"{field}={params[field]}" for field in MOMO_IPN_SIGNATURE_FIELDS
+    )
+    signature = hmac_digest(secret_key, raw_signature.encode(), hashlib.sha256)
+    return {**params, "signature": signature.hex()}
+
+
+def sign_zalopay_params(params, key2="TEST_KEY2"):
+    """Attach the HMAC-SHA256 MAC ZaloPay sends with callbacks."""
+    mac = hmac_digest(key2, params["data"].encode(), hashlib.sha256)
+    return {**params, "mac": mac.hex()}
@@ -5,21 +5,35 @@ Integration tests for Payment Service API endpoints.
 import asyncio
 import hashlib
 import hmac
-import json
 from datetime import datetime, timedelta
 from unittest.mock import AsyncMock, patch
 
+import orjson
 import pytest
-from httpx import AsyncClient
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+
+# Decode response bodies with orjson instead of httpx's stdlib-backed .json()
+_json = orjson.loads
+
+# Payloads for test_concurrent_payment_creation, built once at import time
+CONCURRENT_PAYMENT_PAYLOADS = tuple(
+    {
+        "amount": amount,
+        "payment_method": "vnpay",
+        "description": f"Concurrent payment {amount}",
+    }
+    for amount in range(10000, 15000, 1000)
+)
 
 
 @pytest.mark.asyncio
 class TestPaymentServiceAPIEndpoints:
     """Integration tests for Payment Service API endpoints."""
 
-    @pytest.fixture
+    @pytest.fixture(scope="session")
     def mock_app(self):
-        """Mock FastAPI application for testing."""
+        """Mock FastAPI application for testing, built once per session."""
         from fastapi import Depends, FastAPI, HTTPException
         from fastapi.security import HTTPBearer
 
@@ -462,10 +476,11 @@ class TestPaymentServiceAPIEndpoints:
 
         return app
 
-    @pytest.fixture
+    @pytest_asyncio.fixture(scope="session")
     async def client(self, mock_app):
-        """Create test client."""
-        async with AsyncClient(app=mock_app, base_url="http://test") as ac:
+        """Async client for the mock app, shared by the whole session."""
+        transport = ASGITransport(app=mock_app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
             yield ac
 
     async def test_get_payment_methods(self, client):
@@ -473,7 +488,7 @@ class TestPaymentServiceAPIEndpoints:
         response = await client.get("/payment-methods")
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response.content)
         assert data["success"] is True
         assert "payment_methods" in data
 
@@ -514,7 +529,7 @@ class TestPaymentServiceAPIEndpoints:
         )
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response.content)
         assert data["success"] is True
         assert "transaction" in data
         assert "payment_url" in data
@@ -544,7 +559,7 @@ class TestPaymentServiceAPIEndpoints:
         )
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response.content)
         transaction = data["transaction"]
         assert transaction["payment_method"] == "momo"
         assert "momo.vn" in data["payment_url"]
@@ -561,7 +576,7 @@ class TestPaymentServiceAPIEndpoints:
         )
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response.content)
         transaction = data["transaction"]
         assert transaction["payment_method"] == "zalopay"
         assert "zalopay.vn" in data["payment_url"]
@@ -577,7 +592,7 @@ class TestPaymentServiceAPIEndpoints:
             "/payments/create", json=invalid_amount_data, headers=headers
         )
         assert response.status_code == 400
-        assert "Invalid amount" in response.json()["detail"]
+        assert "Invalid amount" in _json(response.content)["detail"]
 
         # Test missing payment method
         missing_method_data = {"amount": 100000}
@@ -586,7 +601,7 @@ class TestPaymentServiceAPIEndpoints:
             "/payments/create", json=missing_method_data, headers=headers
         )
         assert response.status_code == 400
-        assert "Payment method required" in response.json()["detail"]
+        assert "Payment method required" in _json(response.content)["detail"]
 
         # Test invalid payment method
         invalid_method_data = {"amount": 100000, "payment_method": "invalid_method"}
@@ -595,7 +610,7 @@ class TestPaymentServiceAPIEndpoints:
             "/payments/create", json=invalid_method_data, headers=headers
         )
         assert response.status_code == 400
-        assert "Invalid payment method" in response.json()["detail"]
+        assert "Invalid payment method" in _json(response.content)["detail"]
 
         # Test amount below minimum for VNPay
         below_min_data = {
@@ -607,7 +622,7 @@ class TestPaymentServiceAPIEndpoints:
             "/payments/create", json=below_min_data, headers=headers
         )
         assert response.status_code == 400
-        assert "Amount must be between" in response.json()["detail"]
+        assert "Amount must be between" in _json(response.content)["detail"]
 
         # Test amount above maximum for MoMo
         above_max_data = {
@@ -619,7 +634,7 @@ class TestPaymentServiceAPIEndpoints:
             "/payments/create", json=above_max_data, headers=headers
         )
         assert response.status_code == 400
-        assert "Amount must be between" in response.json()["detail"]
+        assert "Amount must be between" in _json(response.content)["detail"]
 
     async def test_payment_callbacks(self, client):
         """Test payment gateway callbacks."""
@@ -636,7 +651,7 @@ class TestPaymentServiceAPIEndpoints:
         )
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response.content)
         assert data["success"] is True
         assert data["transaction_id"] == "txn_20241215_120000_123"
         assert data["status"] == "completed"
@@ -654,7 +669,7 @@ class TestPaymentServiceAPIEndpoints:
         response = await client.post("/payments/callback/vnpay", json=vnpay_failed_data)
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response.content)
         assert data["status"] == "failed"
         assert data["gateway_response"]["response_code"] == "01"
 
@@ -669,7 +684,7 @@ class TestPaymentServiceAPIEndpoints:
         response = await client.post("/payments/callback/momo", json=momo_success_data)
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response.content)
         assert data["success"] is True
         assert data["status"] == "completed"
         assert data["gateway_response"]["result_code"] == 0
@@ -687,7 +702,7 @@ class TestPaymentServiceAPIEndpoints:
         )
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response.content)
         assert data["success"] is True
         assert data["status"] == "completed"
         assert data["gateway_response"]["return_code"] == 1
@@ -706,7 +721,7 @@ class TestPaymentServiceAPIEndpoints:
             "/payments/callback/vnpay", json=invalid_vnpay_data
         )
         assert response.status_code == 400
-        assert "Invalid VNPay signature" in response.json()["detail"]
+        assert "Invalid VNPay signature" in _json(response.content)["detail"]
 
         # Test MoMo callback with missing parameters
         incomplete_momo_data = {
@@ -719,12 +734,12 @@ class TestPaymentServiceAPIEndpoints:
             "/payments/callback/momo", json=incomplete_momo_data
         )
         assert response.status_code == 400
-        assert "Missing required MoMo parameters" in response.json()["detail"]
+        assert "Missing required MoMo parameters" in _json(response.content)["detail"]
 
         # Test invalid payment method callback
         response = await client.post("/payments/callback/invalid_method", json={})
         assert response.status_code == 400
-        assert "Invalid payment method" in response.json()["detail"]
+        assert "Invalid payment method" in _json(response.content)["detail"]
 
     async def test_get_transactions(self, client):
         """Test get user transactions endpoint."""
@@ -734,7 +749,7 @@ class TestPaymentServiceAPIEndpoints:
         response = await client.get("/transactions", headers=headers)
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response.content)
         assert data["success"] is True
         assert "transactions" in data
         assert "pagination" in data
@@ -753,7 +768,7 @@ class TestPaymentServiceAPIEndpoints:
         response = await client.get("/transactions?page=1&limit=1", headers=headers)
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response.content)
         transactions = data["transactions"]
         assert len(transactions) == 1
 
@@ -767,7 +782,7 @@ class TestPaymentServiceAPIEndpoints:
         response = await client.get("/transactions?status=completed", headers=headers)
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response.content)
         transactions = data["transactions"]
         assert len(transactions) == 1
         assert transactions[0]["status"] == "completed"
@@ -782,7 +797,7 @@ class TestPaymentServiceAPIEndpoints:
         )
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response.content)
         assert data["success"] is True
         assert "transaction" in data
 
@@ -795,7 +810,7 @@ class TestPaymentServiceAPIEndpoints:
         # Test get non-existent transaction
         response = await client.get("/transactions/non_existent_txn", headers=headers)
         assert response.status_code == 404
-        assert "Transaction not found" in response.json()["detail"]
+        assert "Transaction not found" in _json(response.content)["detail"]
 
     async def test_get_balance(self, client):
         """Test get user balance endpoint."""
@@ -804,7 +819,7 @@ class TestPaymentServiceAPIEndpoints:
         response = await client.get("/balance", headers=headers)
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response.content)
         assert data["success"] is True
         assert "balance" in data
 
@@ -828,7 +843,7 @@ class TestPaymentServiceAPIEndpoints:
         )
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response.content)
         assert data["success"] is True
         assert "Balance deposited successfully" in data["message"]
         assert "balance" in data
@@ -847,7 +862,7 @@ class TestPaymentServiceAPIEndpoints:
             "/balance/deposit", json=invalid_deposit_data, headers=headers
         )
         assert response.status_code == 400
-        assert "Invalid amount" in response.json()["detail"]
+        assert "Invalid amount" in _json(response.content)["detail"]
 
         # Test deposit without transaction ID
         no_txn_data = {"amount": 50000}
@@ -856,18 +871,35 @@ class TestPaymentServiceAPIEndpoints:
             "/balance/deposit", json=no_txn_data, headers=headers
         )
         assert response.status_code == 400
-        assert "Transaction ID required" in response.json()["detail"]
+        assert "Transaction ID required" in _json(response.content)["detail"]
 
     async def test_admin_endpoints(self, client):
         """Test admin-only endpoints."""
         admin_headers = {"Authorization": "Bearer admin_token"}
         user_headers = {"Authorization": "Bearer valid_token"}
 
+        # Read-only requests are independent, so issue them concurrently
+        (
+            all_response,
+            filtered_response,
+            stats_response,
+            user_transactions_response,
+            user_stats_response,
+        ) = await asyncio.gather(
+            client.get("/admin/transactions", headers=admin_headers),
+            client.get(
+                "/admin/transactions?status=completed&payment_method=vnpay",
+                headers=admin_headers,
+            ),
+            client.get("/admin/statistics", headers=admin_headers),
+            client.get("/admin/transactions", headers=user_headers),
+            client.get("/admin/statistics", headers=user_headers),
+        )
+
         # Test admin get all transactions
-        response = await client.get("/admin/transactions", headers=admin_headers)
-        assert response.status_code == 200
+        assert all_response.status_code == 200
 
-        data = response.json()
+        data = _json(all_response.content)
         assert data["success"] is True
         assert "transactions" in data
 
@@ -875,23 +907,18 @@ class TestPaymentServiceAPIEndpoints:
         assert len(transactions) == 2
 
         # Test admin get transactions with filters
-        response = await client.get(
-            "/admin/transactions?status=completed&payment_method=vnpay",
-            headers=admin_headers,
-        )
-        assert response.status_code == 200
+        assert filtered_response.status_code == 200
 
-        data = response.json()
+        data = _json(filtered_response.content)
         transactions = data["transactions"]
         assert len(transactions) == 1
         assert transactions[0]["status"] == "completed"
         assert transactions[0]["payment_method"] == "vnpay"
 
         # Test admin get statistics
-        response = await client.get("/admin/statistics", headers=admin_headers)
-        assert response.status_code == 200
+        assert stats_response.status_code == 200
 
-        data = response.json()
+        data = _json(stats_response.content)
         assert data["success"] is True
         assert "statistics" in data
 
@@ -902,13 +929,14 @@ class TestPaymentServiceAPIEndpoints:
         assert "daily_stats" in stats
 
         # Test non-admin access to admin endpoints
-        response = await client.get("/admin/transactions", headers=user_headers)
-        assert response.status_code == 403
-        assert "Admin access required" in response.json()["detail"]
+        assert user_transactions_response.status_code == 403
+        assert (
+            "Admin access required"
+            in _json(user_transactions_response.content)["detail"]
+        )
 
-        response = await client.get("/admin/statistics", headers=user_headers)
-        assert response.status_code == 403
-        assert "Admin access required" in response.json()["detail"]
+        assert user_stats_response.status_code == 403
+        assert "Admin access required" in _json(user_stats_response.content)["detail"]
 
     async def test_authentication_required(self, client):
         """Test endpoints require authentication."""
@@ -933,20 +961,17 @@ class TestPaymentServiceAPIEndpoints:
         """Test concurrent payment creation."""
         headers = {"Authorization": "Bearer valid_token"}
 
-        async def create_payment(amount):
-            payment_data = {
-                "amount": amount,
-                "payment_method": "vnpay",
-                "description": f"Concurrent payment {amount}",
-            }
+        async def create_payment(payment_data):
             response = await client.post(
                 "/payments/create", json=payment_data, headers=headers
             )
             return response.status_code == 200
 
-        # Test 5 concurrent payment creations
-        tasks = [create_payment(10000 + i * 1000) for i in range(5)]
-        results = await asyncio.gather(*tasks)
+        # Test 5 concurrent payment creations over the shared client; the
+        # fan-out is small enough that no semaphore is needed to bound it
+        results = await asyncio.gather(
+            *(create_payment(payload) for payload in CONCURRENT_PAYMENT_PAYLOADS)
+        )
 
         # All payments should succeed
         assert all(results)
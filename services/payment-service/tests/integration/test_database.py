@@ -0,0 +1,52 @@
+"""
+Integration tests for the Payment Service database connection.
+"""
+
+import orjson
+import pytest
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+# Representative ~500 byte gateway payload stored in gateway_response
+GATEWAY_RESPONSE = {
+    "transaction_no": "GW123456789",
+    "bank_code": "NCB",
+    "bank_tran_no": "VNP14012345",
+    "card_type": "ATM",
+    "response_code": "00",
+    "transaction_status": "00",
+    "pay_date": "20240101120000",
+    "order_info": "Nap tien vao tai khoan " + "x" * 200,
+    "amount": 10000000,
+    "secure_hash": "a" * 128,
+}
+
+
+@pytest.mark.asyncio
+class TestDatabaseSession:
+    """Test the pooled database session fixture."""
+
+    async def test_session_executes_query(self, db_session):
+        """Test a query round-trips through the pooled connection."""
+        result = await db_session.execute(text("SELECT 1"))
+
+        assert result.scalar_one() == 1
+
+    async def test_gateway_response_jsonb_roundtrip(self, db_session):
+        """Test gateway payloads round-trip through the JSONB serializer."""
+        query = text("SELECT CAST(:payload AS JSONB) AS payload").bindparams(
+            bindparam("payload", type_=JSONB)
+        )
+        query = query.columns(payload=JSONB)
+
+        result = await db_session.execute(query, {"payload": GATEWAY_RESPONSE})
+
+        assert result.scalar_one() == GATEWAY_RESPONSE
+
+    async def test_engine_uses_orjson_for_json(self, async_engine):
+        """Test the engine's JSON columns are (de)serialized with orjson."""
+        dialect = async_engine.sync_engine.dialect
+
+        serialized = dialect._json_serializer(GATEWAY_RESPONSE)
+        assert serialized == orjson.dumps(GATEWAY_RESPONSE).decode()
+        assert dialect._json_deserializer is orjson.loads
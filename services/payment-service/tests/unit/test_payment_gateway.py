@@ -2,23 +2,176 @@
 Unit tests for Payment Gateway functionality.
 """
 
+import base64
 import hashlib
 import hmac
-import json
 from datetime import datetime, timedelta
 from decimal import Decimal
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import orjson
 import pytest
 from fastapi import HTTPException
 
+from ..helpers import MOMO_IPN_SIGNATURE_FIELDS, hmac_digest
+
 # Mock imports - these would be actual imports in real implementation
 # from payment_service.gateways import VNPayGateway, MoMoGateway, ZaloPayGateway
 # from payment_service.models import Transaction, PaymentMethod
 # from payment_service.schemas import PaymentCreate, PaymentCallback
 
+# Fee percentages are stored as Decimal percents; divide by a shared constant
+_FEE_DIVISOR = Decimal(100)
+
+
+def _hmac_hexdigest(secret, message, digestmod):
+    """Hex-encoded :func:`hmac_digest`, as sent to the gateways."""
+    return hmac_digest(secret, message, digestmod).hex()
+
+
+def _hex_matches_digest(received, expected):
+    """Compare a hex signature from a gateway against a raw digest."""
+    try:
+        received = bytes.fromhex(received)
+    except (TypeError, ValueError):
+        return False
+    return hmac.compare_digest(received, expected)
+
+
+# MoMo signs "accessKey=...&<field>=<value>..." over these fields, in order
+_MOMO_CREATE_FIELDS = (
+    "amount",
+    "extraData",
+    "ipnUrl",
+    "orderId",
+    "orderInfo",
+    "partnerCode",
+    "redirectUrl",
+    "requestId",
+    "requestType",
+)
+_MOMO_CREATE_SEPARATORS = tuple(
+    (f"&{field}=".encode(), field) for field in _MOMO_CREATE_FIELDS
+)
+_MOMO_IPN_SEPARATORS = tuple(
+    (f"&{field}=".encode(), field) for field in MOMO_IPN_SIGNATURE_FIELDS
+)
+
+
+def _momo_raw_signature(access_key, data, separators):
+    """Join pre-encoded MoMo separators and field values into the signed bytes."""
+    chunks = [b"accessKey=", access_key.encode()]
+    for separator, field in separators:
+        chunks.append(separator)
+        chunks.append(str(data[field]).encode())
+    return b"".join(chunks)
+
+
+def _verify_vnpay_return(return_data, config):
+    """Verify a VNPay return payload without mutating ``return_data``."""
+    # Extract secure hash
+    received_hash = return_data["vnp_SecureHash"]
+
+    # Recreate hash for verification over every other parameter
+    items = [(k, v) for k, v in return_data.items() if k != "vnp_SecureHash"]
+    items.sort()
+    query_string = "&".join(f"{k}={v}" for k, v in items)
+    expected_hash = hmac_digest(
+        config["hash_secret"], query_string.encode(), hashlib.sha512
+    )
+
+    # Verify hash and response code
+    if not _hex_matches_digest(received_hash, expected_hash):
+        return {"valid": False, "error": "Invalid secure hash"}
+
+    if return_data.get("vnp_ResponseCode") != "00":
+        return {
+            "valid": False,
+            "error": "Payment failed",
+            "response_code": return_data.get("vnp_ResponseCode"),
+        }
+
+    return {
+        "valid": True,
+        "transaction_id": return_data.get("vnp_TxnRef"),
+        "amount": int(return_data.get("vnp_Amount", 0)) / 100,
+        "bank_code": return_data.get("vnp_BankCode"),
+        "transaction_no": return_data.get("vnp_TransactionNo"),
+    }
+
+
+def _verify_momo_callback(callback_data, config):
+    """Verify a MoMo IPN callback payload."""
+    # Extract signature
+    received_signature = callback_data.get("signature", "")
+
+    # Recreate signature for verification
+    raw_signature = _momo_raw_signature(
+        config["access_key"], callback_data, _MOMO_IPN_SEPARATORS
+    )
+
+    expected_signature = hmac_digest(
+        config["secret_key"], raw_signature, hashlib.sha256
+    )
+
+    # Verify signature and result code
+    if not _hex_matches_digest(received_signature, expected_signature):
+        return {"valid": False, "error": "Invalid signature"}
+
+    if callback_data.get("resultCode") != 0:
+        return {
+            "valid": False,
+            "error": "Payment failed",
+            "result_code": callback_data.get("resultCode"),
+            "message": callback_data.get("message"),
+        }
+
+    return {
+        "valid": True,
+        "order_id": callback_data.get("orderId"),
+        "amount": callback_data.get("amount"),
+        "trans_id": callback_data.get("transId"),
+    }
+
+
+def _verify_zalopay_callback(callback_data, config):
+    """Verify a ZaloPay callback payload."""
+    # Extract MAC
+    received_mac = callback_data.get("mac", "")
+
+    # Decode and verify data
+    try:
+        decoded_data = base64.b64decode(callback_data["data"]).decode()
+        data_json = orjson.loads(decoded_data)
+
+        # Recreate MAC for verification
+        mac_data = callback_data["data"]
+        expected_mac = hmac_digest(config["key2"], mac_data.encode(), hashlib.sha256)
+
+        # Verify MAC and type
+        if not _hex_matches_digest(received_mac, expected_mac):
+            return {"valid": False, "error": "Invalid MAC"}
+
+        if callback_data.get("type") != 1:
+            return {
+                "valid": False,
+                "error": "Payment failed",
+                "type": callback_data.get("type"),
+            }
+
+        return {
+            "valid": True,
+            "app_trans_id": data_json.get("app_trans_id"),
+            "amount": data_json.get("amount"),
+            "app_user": data_json.get("app_user"),
+        }
+
+    except Exception as e:
+        return {"valid": False, "error": f"Data parsing error: {str(e)}"}
+
 
 @pytest.mark.asyncio
+@pytest.mark.xdist_group(name="vnpay")
 class TestVNPayGateway:
     """Test VNPay payment gateway functionality."""
 
@@ -56,9 +209,9 @@ class TestVNPayGateway:
             # Create secure hash
             sorted_params = sorted(params.items())
             query_string = "&".join([f"{k}={v}" for k, v in sorted_params])
-            secure_hash = hmac.new(
-                config["hash_secret"].encode(), query_string.encode(), hashlib.sha512
-            ).hexdigest()
+            secure_hash = _hmac_hexdigest(
+                config["hash_secret"], query_string.encode(), hashlib.sha512
+            )
 
             params["vnp_SecureHash"] = secure_hash
 
@@ -79,33 +232,7 @@ class TestVNPayGateway:
         """Test successful VNPay payment return verification."""
         return_data = mock_vnpay_responses["payment_return_success"]
 
-        def verify_vnpay_return(return_data, config):
-            # Extract secure hash
-            received_hash = return_data.pop("vnp_SecureHash")
-
-            # Recreate hash for verification
-            sorted_params = sorted(return_data.items())
-            query_string = "&".join([f"{k}={v}" for k, v in sorted_params])
-            expected_hash = hmac.new(
-                config["hash_secret"].encode(), query_string.encode(), hashlib.sha512
-            ).hexdigest()
-
-            # Verify hash and response code
-            if received_hash != expected_hash:
-                return {"valid": False, "error": "Invalid secure hash"}
-
-            if return_data.get("vnp_ResponseCode") != "00":
-                return {"valid": False, "error": "Payment failed"}
-
-            return {
-                "valid": True,
-                "transaction_id": return_data.get("vnp_TxnRef"),
-                "amount": int(return_data.get("vnp_Amount", 0)) / 100,
-                "bank_code": return_data.get("vnp_BankCode"),
-                "transaction_no": return_data.get("vnp_TransactionNo"),
-            }
-
-        result = verify_vnpay_return(return_data.copy(), self.vnpay_config)
+        result = _verify_vnpay_return(return_data, self.vnpay_config)
 
         assert result["valid"] is True
         assert result["transaction_id"] == "TXN_123456789"
@@ -116,16 +243,7 @@ class TestVNPayGateway:
         """Test failed VNPay payment return verification."""
         return_data = mock_vnpay_responses["payment_return_failed"]
 
-        def verify_vnpay_return(return_data, config):
-            if return_data.get("vnp_ResponseCode") != "00":
-                return {
-                    "valid": False,
-                    "error": "Payment failed",
-                    "response_code": return_data.get("vnp_ResponseCode"),
-                }
-            return {"valid": True}
-
-        result = verify_vnpay_return(return_data, self.vnpay_config)
+        result = _verify_vnpay_return(return_data, self.vnpay_config)
 
         assert result["valid"] is False
         assert result["error"] == "Payment failed"
@@ -133,31 +251,18 @@ class TestVNPayGateway:
 
     def test_invalid_secure_hash(self, mock_vnpay_responses):
         """Test VNPay return with invalid secure hash."""
-        return_data = mock_vnpay_responses["payment_return_success"].copy()
+        # The fixture is function-scoped, so it can be tampered with in place
+        return_data = mock_vnpay_responses["payment_return_success"]
         return_data["vnp_SecureHash"] = "invalid_hash"
 
-        def verify_vnpay_return(return_data, config):
-            received_hash = return_data.pop("vnp_SecureHash")
-
-            # Recreate hash for verification
-            sorted_params = sorted(return_data.items())
-            query_string = "&".join([f"{k}={v}" for k, v in sorted_params])
-            expected_hash = hmac.new(
-                config["hash_secret"].encode(), query_string.encode(), hashlib.sha512
-            ).hexdigest()
-
-            if received_hash != expected_hash:
-                return {"valid": False, "error": "Invalid secure hash"}
-
-            return {"valid": True}
-
-        result = verify_vnpay_return(return_data, self.vnpay_config)
+        result = _verify_vnpay_return(return_data, self.vnpay_config)
 
         assert result["valid"] is False
         assert result["error"] == "Invalid secure hash"
 
 
 @pytest.mark.asyncio
+@pytest.mark.xdist_group(name="momo")
 class TestMoMoGateway:
     """Test MoMo payment gateway functionality."""
 
@@ -202,11 +307,13 @@ class TestMoMoGateway:
             }
 
             # Create signature
-            raw_signature = f"accessKey={config['access_key']}&amount={request_data['amount']}&extraData={request_data['extraData']}&ipnUrl={request_data['ipnUrl']}&orderId={request_data['orderId']}&orderInfo={request_data['orderInfo']}&partnerCode={request_data['partnerCode']}&redirectUrl={request_data['redirectUrl']}&requestId={request_data['requestId']}&requestType={request_data['requestType']}"
+            raw_signature = _momo_raw_signature(
+                config["access_key"], request_data, _MOMO_CREATE_SEPARATORS
+            )
 
-            signature = hmac.new(
-                config["secret_key"].encode(), raw_signature.encode(), hashlib.sha256
-            ).hexdigest()
+            signature = _hmac_hexdigest(
+                config["secret_key"], raw_signature, hashlib.sha256
+            )
 
             request_data["signature"] = signature
 
@@ -228,32 +335,7 @@ class TestMoMoGateway:
         """Test successful MoMo payment callback verification."""
         callback_data = mock_momo_responses["payment_return_success"]
 
-        def verify_momo_callback(callback_data, config):
-            # Extract signature
-            received_signature = callback_data.get("signature", "")
-
-            # Recreate signature for verification
-            raw_signature = f"accessKey={config['access_key']}&amount={callback_data['amount']}&extraData={callback_data.get('extraData', '')}&message={callback_data['message']}&orderId={callback_data['orderId']}&orderInfo={callback_data['orderInfo']}&orderType={callback_data['orderType']}&partnerCode={callback_data['partnerCode']}&payType={callback_data['payType']}&requestId={callback_data['requestId']}&responseTime={callback_data['responseTime']}&resultCode={callback_data['resultCode']}&transId={callback_data['transId']}"
-
-            expected_signature = hmac.new(
-                config["secret_key"].encode(), raw_signature.encode(), hashlib.sha256
-            ).hexdigest()
-
-            # Verify signature and result code
-            if received_signature != expected_signature:
-                return {"valid": False, "error": "Invalid signature"}
-
-            if callback_data.get("resultCode") != 0:
-                return {"valid": False, "error": "Payment failed"}
-
-            return {
-                "valid": True,
-                "order_id": callback_data.get("orderId"),
-                "amount": callback_data.get("amount"),
-                "trans_id": callback_data.get("transId"),
-            }
-
-        result = verify_momo_callback(callback_data, self.momo_config)
+        result = _verify_momo_callback(callback_data, self.momo_config)
 
         assert result["valid"] is True
         assert result["order_id"] == "ORDER_123456789"
@@ -264,17 +346,7 @@ class TestMoMoGateway:
         """Test failed MoMo payment callback verification."""
         callback_data = mock_momo_responses["payment_return_failed"]
 
-        def verify_momo_callback(callback_data, config):
-            if callback_data.get("resultCode") != 0:
-                return {
-                    "valid": False,
-                    "error": "Payment failed",
-                    "result_code": callback_data.get("resultCode"),
-                    "message": callback_data.get("message"),
-                }
-            return {"valid": True}
-
-        result = verify_momo_callback(callback_data, self.momo_config)
+        result = _verify_momo_callback(callback_data, self.momo_config)
 
         assert result["valid"] is False
         assert result["error"] == "Payment failed"
@@ -283,6 +355,7 @@ class TestMoMoGateway:
 
 
 @pytest.mark.asyncio
+@pytest.mark.xdist_group(name="zalopay")
 class TestZaloPayGateway:
     """Test ZaloPay payment gateway functionality."""
 
@@ -317,9 +390,9 @@ class TestZaloPayGateway:
                 "app_time": int(datetime.now().timestamp() * 1000),
                 "amount": int(transaction_data["amount"]),
                 "app_trans_id": app_trans_id,
-                "embed_data": json.dumps(
+                "embed_data": orjson.dumps(
                     {"return_url": transaction_data["return_url"]}
-                ),
+                ).decode(),
                 "item": "[]",
                 "description": transaction_data["description"],
                 "bank_code": "",
@@ -329,9 +402,7 @@ class TestZaloPayGateway:
             # Create MAC
             mac_data = f"{config['app_id']}|{request_data['app_trans_id']}|{request_data['app_user']}|{request_data['amount']}|{request_data['app_time']}|{request_data['embed_data']}|{request_data['item']}"
 
-            mac = hmac.new(
-                config["key1"].encode(), mac_data.encode(), hashlib.sha256
-            ).hexdigest()
+            mac = _hmac_hexdigest(config["key1"], mac_data.encode(), hashlib.sha256)
 
             request_data["mac"] = mac
 
@@ -352,41 +423,7 @@ class TestZaloPayGateway:
         """Test successful ZaloPay payment callback verification."""
         callback_data = mock_zalopay_responses["payment_return_success"]
 
-        def verify_zalopay_callback(callback_data, config):
-            # Extract MAC
-            received_mac = callback_data.get("mac", "")
-
-            # Decode and verify data
-            try:
-                import base64
-
-                decoded_data = base64.b64decode(callback_data["data"]).decode()
-                data_json = json.loads(decoded_data)
-
-                # Recreate MAC for verification
-                mac_data = callback_data["data"]
-                expected_mac = hmac.new(
-                    config["key2"].encode(), mac_data.encode(), hashlib.sha256
-                ).hexdigest()
-
-                # Verify MAC and type
-                if received_mac != expected_mac:
-                    return {"valid": False, "error": "Invalid MAC"}
-
-                if callback_data.get("type") != 1:
-                    return {"valid": False, "error": "Payment failed"}
-
-                return {
-                    "valid": True,
-                    "app_trans_id": data_json.get("app_trans_id"),
-                    "amount": data_json.get("amount"),
-                    "app_user": data_json.get("app_user"),
-                }
-
-            except Exception as e:
-                return {"valid": False, "error": f"Data parsing error: {str(e)}"}
-
-        result = verify_zalopay_callback(callback_data, self.zalopay_config)
+        result = _verify_zalopay_callback(callback_data, self.zalopay_config)
 
         assert result["valid"] is True
         # Note: In real implementation, would decode base64 data and verify
@@ -395,16 +432,7 @@ class TestZaloPayGateway:
         """Test failed ZaloPay payment callback verification."""
         callback_data = mock_zalopay_responses["payment_return_failed"]
 
-        def verify_zalopay_callback(callback_data, config):
-            if callback_data.get("type") != 1:
-                return {
-                    "valid": False,
-                    "error": "Payment failed",
-                    "type": callback_data.get("type"),
-                }
-            return {"valid": True}
-
-        result = verify_zalopay_callback(callback_data, self.zalopay_config)
+        result = _verify_zalopay_callback(callback_data, self.zalopay_config)
 
         assert result["valid"] is False
         assert result["error"] == "Payment failed"
@@ -412,73 +440,69 @@ class TestZaloPayGateway:
 
 
 @pytest.mark.asyncio
+@pytest.mark.xdist_group(name="gateway_factory")
 class TestPaymentGatewayFactory:
     """Test payment gateway factory and selection."""
 
-    def test_gateway_selection_by_code(self, sample_payment_methods):
+    def test_gateway_selection_by_code(self, payment_methods_by_code):
         """Test gateway selection by payment method code."""
 
         def get_gateway_by_code(code, payment_methods):
-            for method in payment_methods:
-                if method["code"] == code and method["is_active"]:
-                    return method
-            return None
+            return payment_methods.get(code)
 
         # Test valid codes
-        vnpay = get_gateway_by_code("VNPAY", sample_payment_methods)
+        vnpay = get_gateway_by_code("VNPAY", payment_methods_by_code)
         assert vnpay is not None
-        assert vnpay["name"] == "VNPay"
+        assert vnpay.name == "VNPay"
 
-        momo = get_gateway_by_code("MOMO", sample_payment_methods)
+        momo = get_gateway_by_code("MOMO", payment_methods_by_code)
         assert momo is not None
-        assert momo["name"] == "MoMo"
+        assert momo.name == "MoMo"
 
-        zalopay = get_gateway_by_code("ZALOPAY", sample_payment_methods)
+        zalopay = get_gateway_by_code("ZALOPAY", payment_methods_by_code)
         assert zalopay is not None
-        assert zalopay["name"] == "ZaloPay"
+        assert zalopay.name == "ZaloPay"
 
         # Test invalid code
-        invalid = get_gateway_by_code("INVALID", sample_payment_methods)
+        invalid = get_gateway_by_code("INVALID", payment_methods_by_code)
         assert invalid is None
 
-    def test_amount_validation(self, sample_payment_methods):
+    def test_amount_validation(self, vnpay_method):
         """Test payment amount validation against gateway limits."""
 
         def validate_amount(amount, payment_method):
-            if amount < payment_method["min_amount"]:
+            if amount < payment_method.min_amount:
                 return {
                     "valid": False,
-                    "error": f"Amount below minimum {payment_method['min_amount']}",
+                    "error": f"Amount below minimum {payment_method.min_amount}",
                 }
-            if amount > payment_method["max_amount"]:
+            if amount > payment_method.max_amount:
                 return {
                     "valid": False,
-                    "error": f"Amount above maximum {payment_method['max_amount']}",
+                    "error": f"Amount above maximum {payment_method.max_amount}",
                 }
             return {"valid": True}
 
-        vnpay = next(m for m in sample_payment_methods if m["code"] == "VNPAY")
-
         # Test valid amount
-        result = validate_amount(Decimal("100000"), vnpay)
+        result = validate_amount(Decimal("100000"), vnpay_method)
         assert result["valid"] is True
 
         # Test amount below minimum
-        result = validate_amount(Decimal("5000"), vnpay)
+        result = validate_amount(Decimal("5000"), vnpay_method)
         assert result["valid"] is False
         assert "below minimum" in result["error"]
 
         # Test amount above maximum
-        result = validate_amount(Decimal("100000000"), vnpay)
+        result = validate_amount(Decimal("100000000"), vnpay_method)
         assert result["valid"] is False
         assert "above maximum" in result["error"]
 
-    def test_fee_calculation(self, sample_payment_methods):
+    def test_fee_calculation(self, vnpay_method):
         """Test payment fee calculation."""
 
         def calculate_fee(amount, payment_method):
-            fee_percent = payment_method["fee_percent"]
-            fee_amount = amount * fee_percent / 100
+            fee_percent = payment_method.fee_percent
+            fee_amount = amount * fee_percent / _FEE_DIVISOR
             total_amount = amount + fee_amount
             return {
                 "original_amount": amount,
@@ -487,8 +511,7 @@ class TestPaymentGatewayFactory:
                 "fee_percent": fee_percent,
             }
 
-        vnpay = next(m for m in sample_payment_methods if m["code"] == "VNPAY")
-        result = calculate_fee(Decimal("100000"), vnpay)
+        result = calculate_fee(Decimal("100000"), vnpay_method)
 
         assert result["original_amount"] == Decimal("100000")
         assert result["fee_amount"] == Decimal("2500")  # 2.5% of 100000
@@ -2,141 +2,529 @@
 Unit tests for Transaction CRUD operations.
 """
 
-from datetime import datetime, timedelta
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
+from functools import cached_property
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from fastapi import HTTPException
+from sqlalchemy import Numeric, bindparam, column, func, insert, select, table, update
 
 # Mock imports - these would be actual imports in real implementation
 # from payment_service.crud import TransactionCRUD, BalanceCRUD
 # from payment_service.models import Transaction, Balance, PaymentMethod
 # from payment_service.schemas import TransactionCreate, TransactionUpdate
 
+# Lightweight stand-in for the transactions table so helpers can build real SQL.
+# Helpers only compare columns against Python values, so every value is sent as
+# a bound parameter and the statement text stays identical across calls. With
+# asyncpg that text is served from the per-connection prepared statement cache
+# (statement_cache_size, default 100), so repeated pagination skips parse/plan.
+transactions_table = table(
+    "transactions",
+    column("id"),
+    column("user_id"),
+    column("status"),
+    column("amount"),
+    column("payment_method"),
+    column("description"),
+    column("created_at"),
+    column("updated_at"),
+)
+
+# Lightweight stand-in for the per-user balances table
+balances_table = table(
+    "balances",
+    column("user_id"),
+    column("current_balance"),
+    column("total_deposited"),
+    column("total_spent"),
+    column("updated_at"),
+)
+
+_EMPTY = frozenset()
+
+# Allowed next statuses for each transaction status
+VALID_TRANSITIONS = {
+    "pending": frozenset({"completed", "failed", "cancelled"}),
+    "completed": _EMPTY,
+    "failed": _EMPTY,
+    "cancelled": _EMPTY,
+}
+
+
+REQUIRED_TRANSACTION_FIELDS = ("user_id", "amount", "payment_method", "description")
+
+
+_ZERO = Decimal("0")
+
+
+@dataclass(slots=True)
+class FakeBalance:
+    """Stand-in for the Balance model."""
+
+    user_id: int
+    current_balance: Decimal = _ZERO
+    total_deposited: Decimal = _ZERO
+    total_spent: Decimal = _ZERO
+
+
+class Transaction:
+    """Stand-in for the Transaction model."""
+
+    def __init__(self, **columns):
+        self.__dict__.update(columns)
+        self.__dict__.setdefault("gateway_response", None)
+
+    @cached_property
+    def transaction_ref(self):
+        # Derived once id/created_at are loaded after flush, then cached
+        return f"TXN_{self.id:012d}_{int(self.created_at.timestamp()):010d}"
+
+    @cached_property
+    def gateway_transaction_id(self):
+        if not self.gateway_response:
+            return None
+        return self.gateway_response.get("transaction_no")
+
+    def set_gateway_response(self, gateway_response):
+        self.gateway_response = gateway_response
+        # Re-derive the gateway id from the new payload on next access
+        self.__dict__.pop("gateway_transaction_id", None)
+
+
+# Mock CRUD functions
+def validate_transaction_data(transaction_data):
+    # Validate required fields
+    for field in REQUIRED_TRANSACTION_FIELDS:
+        if field not in transaction_data:
+            raise ValueError(f"Missing required field: {field}")
+
+    # Validate amount
+    if transaction_data["amount"] <= 0:
+        raise ValueError("Amount must be positive")
+
+
+async def create_transaction(db_session, transaction_data):
+    validate_transaction_data(transaction_data)
+
+    # Create transaction object
+    transaction = Transaction(
+        user_id=transaction_data["user_id"],
+        amount=transaction_data["amount"],
+        payment_method=transaction_data["payment_method"],
+        description=transaction_data["description"],
+        status="pending",
+    )
+
+    # Simulate database operations; id and created_at/updated_at come from
+    # the server and are loaded by refresh(), transaction_ref is lazy
+    db_session.add(transaction)
+    await db_session.commit()
+    await db_session.refresh(transaction)
+
+    return transaction
+
+
+async def create_transactions_bulk(db_session, rows):
+    # Validate the whole batch before touching the session
+    for row in rows:
+        validate_transaction_data(row)
+
+    transactions = [
+        Transaction(
+            user_id=row["user_id"],
+            amount=row["amount"],
+            payment_method=row["payment_method"],
+            description=row["description"],
+            status="pending",
+        )
+        for row in rows
+    ]
+
+    # One flush and commit for the whole batch
+    db_session.add_all(transactions)
+    await db_session.commit()
+
+    return transactions
+
+
+async def insert_transactions_bulk(db_session, rows):
+    # Single multi-row INSERT ... VALUES (...), (...) statement
+    for row in rows:
+        validate_transaction_data(row)
+
+    # created_at/updated_at are filled by server-side defaults
+    values = [
+        {
+            "user_id": row["user_id"],
+            "amount": row["amount"],
+            "payment_method": row["payment_method"],
+            "description": row["description"],
+            "status": "pending",
+        }
+        for row in rows
+    ]
+
+    await db_session.execute(insert(transactions_table).values(values))
+    await db_session.commit()
+
+    return len(values)
+
+
+async def get_transaction_by_id(db_session, transaction_id):
+    transaction = await db_session.get(Transaction, transaction_id)
+    if not transaction:
+        return None
+    return transaction
+
+
+async def update_transaction_status(
+    db_session, transaction_id, new_status, gateway_response=None
+):
+    transaction = await db_session.get(Transaction, transaction_id)
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+
+    # Validate status transition
+    if new_status not in VALID_TRANSITIONS.get(transaction.status, _EMPTY):
+        raise ValueError(
+            f"Invalid status transition from {transaction.status} to {new_status}"
+        )
+
+    # Update transaction
+    transaction.status = new_status
+    # Evaluated by the database at flush, like the server_default on insert
+    transaction.updated_at = func.now()
+
+    if gateway_response:
+        transaction.set_gateway_response(gateway_response)
+
+    await db_session.commit()
+    await db_session.refresh(transaction)
+
+    return transaction
+
+
+async def get_user_transactions(db_session, user_id, limit=10, offset=0, status=None):
+    # Filter and paginate in the database rather than slicing in Python
+    query = select(transactions_table).where(transactions_table.c.user_id == user_id)
+    if status:
+        query = query.where(transactions_table.c.status == status)
+    query = query.limit(limit).offset(offset)
+
+    # A Core table select has no entity; scalars() would keep only the id column
+    query_result = await db_session.execute(query)
+    return query_result.mappings().all()
+
+
+async def get_transactions_by_date_range(
+    db_session, start_date, end_date, user_id=None
+):
+    # Served by an index such as:
+    # CREATE INDEX ix_tx_user_created ON transactions(user_id, created_at)
+    query = select(transactions_table).where(
+        transactions_table.c.created_at >= start_date,
+        transactions_table.c.created_at <= end_date,
+    )
+    if user_id:
+        query = query.where(transactions_table.c.user_id == user_id)
+
+    query_result = await db_session.execute(query)
+    return query_result.mappings().all()
+
+
+async def calculate_transaction_statistics(
+    db_session, user_id=None, date_from=None, date_to=None
+):
+    # Aggregate per status in the database; at most one row per status
+    query = select(
+        transactions_table.c.status,
+        func.count(),
+        func.coalesce(func.sum(transactions_table.c.amount), 0),
+    ).group_by(transactions_table.c.status)
+
+    if user_id:
+        query = query.where(transactions_table.c.user_id == user_id)
+
+    if date_from:
+        query = query.where(transactions_table.c.created_at >= date_from)
+
+    if date_to:
+        query = query.where(transactions_table.c.created_at <= date_to)
+
+    query_result = await db_session.execute(query)
+
+    status_counts = {"completed": 0, "failed": 0, "pending": 0}
+    total_transactions = 0
+    total_amount = 0
+    for status, status_count, status_amount in query_result.all():
+        total_transactions += status_count
+        if status in status_counts:
+            status_counts[status] = status_count
+        if status == "completed":
+            total_amount = status_amount
+
+    completed_transactions = status_counts["completed"]
+    failed_transactions = status_counts["failed"]
+    pending_transactions = status_counts["pending"]
+
+    average_amount = (
+        total_amount / completed_transactions if completed_transactions > 0 else 0
+    )
+
+    success_rate = (
+        (completed_transactions / total_transactions * 100)
+        if total_transactions > 0
+        else 0
+    )
+
+    return {
+        "total_transactions": total_transactions,
+        "completed_transactions": completed_transactions,
+        "failed_transactions": failed_transactions,
+        "pending_transactions": pending_transactions,
+        "total_amount": total_amount,
+        "average_amount": average_amount,
+        "success_rate": round(success_rate, 2),
+    }
+
+
+async def get_user_balance(db_session, user_id):
+    query_result = await db_session.execute(MagicMock())
+    balance = query_result.scalar_one_or_none()
+
+    if not balance:
+        # Create new balance record if doesn't exist
+        balance = FakeBalance(user_id=user_id)
+
+        db_session.add(balance)
+        await db_session.commit()
+        await db_session.refresh(balance)
+
+    return balance
+
+
+async def update_balance_deposit(db_session, user_id, amount):
+    if amount <= 0:
+        raise ValueError("Deposit amount must be positive")
+
+    # Single atomic UPDATE ... RETURNING instead of SELECT then UPDATE; the
+    # arithmetic runs on numeric server-side and the new values come back
+    amount_param = bindparam("amount", amount, type_=Numeric())
+    query = (
+        update(balances_table)
+        .where(balances_table.c.user_id == user_id)
+        .values(
+            current_balance=balances_table.c.current_balance + amount_param,
+            total_deposited=balances_table.c.total_deposited + amount_param,
+            updated_at=func.now(),
+        )
+        .returning(balances_table)
+    )
+    query_result = await db_session.execute(query)
+    balance = query_result.one_or_none()
+
+    if not balance:
+        raise ValueError("Balance record not found")
+
+    await db_session.commit()
+
+    return balance
+
+
+async def update_balance_spend(db_session, user_id, amount):
+    if amount <= 0:
+        raise ValueError("Spend amount must be positive")
+
+    # The balance check is part of the UPDATE, so concurrent spends cannot
+    # overdraw the account between a read and a write
+    amount_param = bindparam("amount", amount, type_=Numeric())
+    query = (
+        update(balances_table)
+        .where(
+            balances_table.c.user_id == user_id,
+            balances_table.c.current_balance >= amount_param,
+        )
+        .values(
+            current_balance=balances_table.c.current_balance - amount_param,
+            total_spent=balances_table.c.total_spent + amount_param,
+            updated_at=func.now(),
+        )
+        .returning(balances_table)
+    )
+    query_result = await db_session.execute(query)
+    balance = query_result.one_or_none()
+
+    if not balance:
+        raise ValueError("Insufficient balance")
+
+    await db_session.commit()
+
+    return balance
+
 
 @pytest.mark.asyncio
 class TestTransactionCRUD:
     """Test Transaction CRUD operations."""
 
-    async def test_create_transaction_success(
-        self, mock_db_session, sample_transaction_create_data
+    @pytest.mark.parametrize(
+        "transaction_data, expected_exc, match",
+        [
+            pytest.param(
+                {
+                    "user_id": 1,
+                    "amount": Decimal("100000"),
+                    "payment_method": "VNPAY",
+                    "description": "Nạp tiền vào tài khoản",
+                },
+                None,
+                None,
+                id="success",
+            ),
+            pytest.param(
+                {
+                    "user_id": 1,
+                    "amount": Decimal("-100"),  # Negative amount
+                    "payment_method": "VNPAY",
+                    "description": "Test payment",
+                },
+                ValueError,
+                "Amount must be positive",
+                id="invalid_amount",
+            ),
+            pytest.param(
+                # Missing payment_method and description
+                {"user_id": 1, "amount": Decimal("100000")},
+                ValueError,
+                "Missing required field: payment_method",
+                id="missing_fields",
+            ),
+        ],
+    )
+    async def test_create_transaction(
+        self, mock_db_session, transaction_data, expected_exc, match
     ):
-        """Test successful transaction creation."""
-        # Mock database response
-        mock_transaction = MagicMock()
-        mock_transaction.id = 1
-        mock_transaction.user_id = sample_transaction_create_data["user_id"]
-        mock_transaction.amount = sample_transaction_create_data["amount"]
-        mock_transaction.status = "pending"
-        mock_transaction.created_at = datetime.utcnow()
-
-        mock_db_session.add.return_value = None
-        mock_db_session.commit.return_value = None
-        mock_db_session.refresh.return_value = None
-
-        # Mock CRUD function
-        async def create_transaction(db_session, transaction_data):
-            # Validate required fields
-            required_fields = ["user_id", "amount", "payment_method", "description"]
-            for field in required_fields:
-                if field not in transaction_data:
-                    raise ValueError(f"Missing required field: {field}")
-
-            # Validate amount
-            if transaction_data["amount"] <= 0:
-                raise ValueError("Amount must be positive")
-
-            # Create transaction object
-            transaction = MagicMock()
-            transaction.id = 1
-            transaction.user_id = transaction_data["user_id"]
-            transaction.amount = transaction_data["amount"]
-            transaction.payment_method = transaction_data["payment_method"]
-            transaction.description = transaction_data["description"]
-            transaction.status = "pending"
-            transaction.transaction_ref = (
-                f"TXN_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            )
-            transaction.created_at = datetime.utcnow()
-            transaction.updated_at = datetime.utcnow()
+        """Test transaction creation and its validation errors."""
+        created_at = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
 
-            # Simulate database operations
-            db_session.add(transaction)
-            await db_session.commit()
-            await db_session.refresh(transaction)
+        def load_server_columns(transaction):
+            transaction.id = 1
+            transaction.created_at = created_at
 
-            return transaction
+        mock_db_session.refresh.side_effect = load_server_columns
 
-        result = await create_transaction(
-            mock_db_session, sample_transaction_create_data
-        )
+        if expected_exc:
+            with pytest.raises(expected_exc, match=match):
+                await create_transaction(mock_db_session, transaction_data)
 
-        assert result.id == 1
-        assert result.user_id == sample_transaction_create_data["user_id"]
-        assert result.amount == sample_transaction_create_data["amount"]
-        assert result.status == "pending"
-        assert result.transaction_ref.startswith("TXN_")
-
-        # Verify database operations
-        mock_db_session.add.assert_called_once()
-        mock_db_session.commit.assert_called_once()
-        mock_db_session.refresh.assert_called_once()
-
-    async def test_create_transaction_invalid_amount(self, mock_db_session):
-        """Test transaction creation with invalid amount."""
-        invalid_data = {
-            "user_id": 1,
-            "amount": Decimal("-100"),  # Negative amount
-            "payment_method": "VNPAY",
-            "description": "Test payment",
-        }
+            mock_db_session.add.assert_not_called()
+            mock_db_session.commit.assert_not_called()
+        else:
+            result = await create_transaction(mock_db_session, transaction_data)
 
-        async def create_transaction(db_session, transaction_data):
-            if transaction_data["amount"] <= 0:
-                raise ValueError("Amount must be positive")
-            return MagicMock()
+            assert result.id == 1
+            assert result.user_id == transaction_data["user_id"]
+            assert result.amount == transaction_data["amount"]
+            assert result.status == "pending"
+            assert result.transaction_ref == (
+                f"TXN_{1:012d}_{int(created_at.timestamp()):010d}"
+            )
+            assert result.transaction_ref is result.transaction_ref
+
+            # Verify database operations
+            mock_db_session.add.assert_called_once()
+            mock_db_session.commit.assert_called_once()
+            mock_db_session.refresh.assert_called_once()
+
+    @pytest.mark.parametrize("batch_size", [1, 100, 1000])
+    async def test_bulk_create_emits_single_commit(self, mock_db_session, batch_size):
+        """Test bulk transaction creation uses one add_all and one commit."""
+        rows = [
+            {
+                "user_id": 1,
+                "amount": Decimal("10000") + i,
+                "payment_method": "VNPAY",
+                "description": f"Bulk payment {i}",
+            }
+            for i in range(batch_size)
+        ]
+
+        result = await create_transactions_bulk(mock_db_session, rows)
+
+        assert len(result) == batch_size
+        assert all(t.status == "pending" for t in result)
+        # Refs derive from server-assigned ids, so none are computed here
+        assert not any("transaction_ref" in vars(t) for t in result)
+
+        # One round trip regardless of batch size
+        assert mock_db_session.add_all.call_count == 1
+        assert mock_db_session.commit.call_count == 1
+        assert mock_db_session.add.call_count == 0
+        assert mock_db_session.refresh.call_count == 0
+
+    async def test_create_transactions_bulk_invalid_row(self, mock_db_session):
+        """Test bulk creation rejects the batch before writing anything."""
+        rows = [
+            {
+                "user_id": 1,
+                "amount": Decimal("10000"),
+                "payment_method": "VNPAY",
+                "description": "Valid payment",
+            },
+            {
+                "user_id": 1,
+                "amount": Decimal("0"),
+                "payment_method": "VNPAY",
+                "description": "Invalid payment",
+            },
+        ]
 
         with pytest.raises(ValueError, match="Amount must be positive"):
-            await create_transaction(mock_db_session, invalid_data)
-
-    async def test_create_transaction_missing_fields(self, mock_db_session):
-        """Test transaction creation with missing required fields."""
-        incomplete_data = {
-            "user_id": 1,
-            "amount": Decimal("100000")
-            # Missing payment_method and description
-        }
+            await create_transactions_bulk(mock_db_session, rows)
+
+        mock_db_session.add_all.assert_not_called()
+        mock_db_session.commit.assert_not_called()
+
+    async def test_insert_transactions_bulk(self, mock_db_session):
+        """Test bulk insert emits one multi-row INSERT statement."""
+        rows = [
+            {
+                "user_id": 1,
+                "amount": Decimal("10000"),
+                "payment_method": "MOMO",
+                "description": f"Bulk payment {i}",
+            }
+            for i in range(30)
+        ]
 
-        async def create_transaction(db_session, transaction_data):
-            required_fields = ["user_id", "amount", "payment_method", "description"]
-            for field in required_fields:
-                if field not in transaction_data:
-                    raise ValueError(f"Missing required field: {field}")
-            return MagicMock()
+        inserted = await insert_transactions_bulk(mock_db_session, rows)
 
-        with pytest.raises(ValueError, match="Missing required field: payment_method"):
-            await create_transaction(mock_db_session, incomplete_data)
+        assert inserted == 30
+        mock_db_session.execute.assert_called_once()
+        mock_db_session.commit.assert_called_once()
+
+        statement = mock_db_session.execute.call_args[0][0]
+        assert str(statement).startswith("INSERT INTO transactions")
+        assert len(statement.compile().params) == 30 * 5
 
     async def test_get_transaction_by_id_success(
-        self, mock_db_session, sample_transaction_data
+        self, mock_db_session, sample_transaction_data, make_txn, frozen_now
     ):
         """Test successful transaction retrieval by ID."""
         # Mock database response
-        mock_transaction = MagicMock()
-        mock_transaction.id = 1
-        mock_transaction.user_id = sample_transaction_data["user_id"]
-        mock_transaction.amount = sample_transaction_data["amount"]
-        mock_transaction.status = sample_transaction_data["status"]
+        mock_transaction = make_txn(
+            id=1,
+            user_id=sample_transaction_data["user_id"],
+            amount=sample_transaction_data["amount"],
+            status=sample_transaction_data["status"],
+            created_at=frozen_now,
+        )
 
         mock_db_session.get.return_value = mock_transaction
 
-        async def get_transaction_by_id(db_session, transaction_id):
-            transaction = await db_session.get(MagicMock, transaction_id)
-            if not transaction:
-                return None
-            return transaction
-
         result = await get_transaction_by_id(mock_db_session, 1)
 
         assert result is not None
@@ -150,275 +538,187 @@ class TestTransactionCRUD:
         """Test transaction retrieval with non-existent ID."""
         mock_db_session.get.return_value = None
 
-        async def get_transaction_by_id(db_session, transaction_id):
-            transaction = await db_session.get(MagicMock, transaction_id)
-            return transaction
-
         result = await get_transaction_by_id(mock_db_session, 999)
 
         assert result is None
         mock_db_session.get.assert_called_once()
 
-    async def test_update_transaction_status_success(
-        self, mock_db_session, sample_transaction_data
+    @pytest.mark.parametrize(
+        "current_status, new_status, gateway_response, expected_exc, match",
+        [
+            pytest.param(
+                "pending",
+                "completed",
+                {
+                    "transaction_no": "GW123456789",
+                    "bank_code": "NCB",
+                    "response_code": "00",
+                },
+                None,
+                None,
+                id="success",
+            ),
+            pytest.param(
+                "completed",
+                "pending",
+                None,
+                ValueError,
+                "Invalid status transition from completed to pending",
+                id="invalid_transition",
+            ),
+        ],
+    )
+    async def test_update_transaction_status(
+        self,
+        mock_db_session,
+        current_status,
+        new_status,
+        gateway_response,
+        expected_exc,
+        match,
     ):
-        """Test successful transaction status update."""
+        """Test transaction status updates and invalid transitions."""
         # Mock existing transaction
-        mock_transaction = MagicMock()
-        mock_transaction.id = 1
-        mock_transaction.status = "pending"
-        mock_transaction.updated_at = datetime.utcnow()
+        mock_transaction = Transaction(id=1, status=current_status)
+        assert mock_transaction.gateway_transaction_id is None
 
         mock_db_session.get.return_value = mock_transaction
-        mock_db_session.commit.return_value = None
-        mock_db_session.refresh.return_value = None
-
-        async def update_transaction_status(
-            db_session, transaction_id, new_status, gateway_response=None
-        ):
-            transaction = await db_session.get(MagicMock, transaction_id)
-            if not transaction:
-                raise HTTPException(status_code=404, detail="Transaction not found")
-
-            # Validate status transition
-            valid_transitions = {
-                "pending": ["completed", "failed", "cancelled"],
-                "completed": [],
-                "failed": [],
-                "cancelled": [],
-            }
 
-            if new_status not in valid_transitions.get(transaction.status, []):
-                raise ValueError(
-                    f"Invalid status transition from {transaction.status} to {new_status}"
+        if expected_exc:
+            with pytest.raises(expected_exc, match=match):
+                await update_transaction_status(
+                    mock_db_session, 1, new_status, gateway_response
                 )
 
-            # Update transaction
-            transaction.status = new_status
-            transaction.updated_at = datetime.utcnow()
-
-            if gateway_response:
-                transaction.gateway_response = gateway_response
-                if "transaction_no" in gateway_response:
-                    transaction.gateway_transaction_id = gateway_response[
-                        "transaction_no"
-                    ]
-
-            await db_session.commit()
-            await db_session.refresh(transaction)
-
-            return transaction
-
-        gateway_response = {
-            "transaction_no": "GW123456789",
-            "bank_code": "NCB",
-            "response_code": "00",
-        }
-
-        result = await update_transaction_status(
-            mock_db_session, 1, "completed", gateway_response
-        )
-
-        assert result.status == "completed"
-        assert result.gateway_response == gateway_response
-        assert result.gateway_transaction_id == "GW123456789"
-
-        mock_db_session.get.assert_called_once()
-        mock_db_session.commit.assert_called_once()
-        mock_db_session.refresh.assert_called_once()
-
-    async def test_update_transaction_invalid_transition(self, mock_db_session):
-        """Test transaction status update with invalid transition."""
-        # Mock completed transaction
-        mock_transaction = MagicMock()
-        mock_transaction.id = 1
-        mock_transaction.status = "completed"
-
-        mock_db_session.get.return_value = mock_transaction
-
-        async def update_transaction_status(db_session, transaction_id, new_status):
-            transaction = await db_session.get(MagicMock, transaction_id)
-
-            valid_transitions = {
-                "pending": ["completed", "failed", "cancelled"],
-                "completed": [],
-                "failed": [],
-                "cancelled": [],
-            }
-
-            if new_status not in valid_transitions.get(transaction.status, []):
-                raise ValueError(
-                    f"Invalid status transition from {transaction.status} to {new_status}"
-                )
+            mock_db_session.commit.assert_not_called()
+        else:
+            result = await update_transaction_status(
+                mock_db_session, 1, new_status, gateway_response
+            )
 
-            return transaction
+            assert result.status == new_status
+            assert result.gateway_response == gateway_response
+            assert result.gateway_transaction_id == "GW123456789"
 
-        with pytest.raises(
-            ValueError, match="Invalid status transition from completed to pending"
-        ):
-            await update_transaction_status(mock_db_session, 1, "pending")
+            mock_db_session.get.assert_called_once()
+            mock_db_session.commit.assert_called_once()
+            mock_db_session.refresh.assert_called_once()
 
     async def test_get_user_transactions_success(
         self, mock_db_session, sample_user_transactions
     ):
         """Test successful retrieval of user transactions."""
-        # Mock database response
-        mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = sample_user_transactions
-
-        mock_db_session.execute.return_value = mock_result
-
-        async def get_user_transactions(
-            db_session, user_id, limit=10, offset=0, status=None
-        ):
-            # Build query conditions
-            conditions = [f"user_id = {user_id}"]
-            if status:
-                conditions.append(f"status = '{status}'")
-
-            # Simulate query execution
-            query_result = await db_session.execute(MagicMock())
-            transactions = query_result.scalars().all()
-
-            # Apply filters and pagination
-            if status:
-                transactions = [t for t in transactions if t.status == status]
-
-            # Apply pagination
-            start_idx = offset
-            end_idx = offset + limit
-            paginated_transactions = transactions[start_idx:end_idx]
-
-            return paginated_transactions
+        # Mock database response - filtering and pagination happen in SQL
+        completed_transactions = [
+            asdict(t)
+            for t in sample_user_transactions
+            if t.user_id == 1 and t.status == "completed"
+        ]
+        mock_result = mock_db_session.execute.return_value
+        mock_result.mappings.return_value.all.return_value = completed_transactions[:5]
 
         result = await get_user_transactions(
             mock_db_session, user_id=1, limit=5, status="completed"
         )
 
-        assert len(result) <= 5
+        assert 0 < len(result) <= 5
         for transaction in result:
-            assert transaction.user_id == 1
-            assert transaction.status == "completed"
+            assert transaction["user_id"] == 1
+            assert transaction["status"] == "completed"
+            assert transaction["amount"] > 0
+        mock_result.scalars.assert_not_called()
 
         mock_db_session.execute.assert_called_once()
 
-    async def test_get_transactions_by_date_range(
-        self, mock_db_session, sample_user_transactions
-    ):
-        """Test transaction retrieval by date range."""
-        start_date = datetime.utcnow() - timedelta(days=7)
-        end_date = datetime.utcnow()
-
-        # Mock database response
-        mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = sample_user_transactions
+        # Verify filters and pagination are pushed down to the query
+        query = mock_db_session.execute.call_args[0][0]
+        assert "LIMIT" in str(query)
+        assert "OFFSET" in str(query)
+        params = query.compile().params
+        assert params["user_id_1"] == 1
+        assert params["status_1"] == "completed"
+        assert params["param_1"] == 5
+        assert params["param_2"] == 0
 
-        mock_db_session.execute.return_value = mock_result
+    async def test_get_user_transactions_binds_parameters(self, mock_db_session):
+        """Test user transaction filters are bound, not interpolated into SQL."""
+        hostile_status = "completed' OR '1'='1"
 
-        async def get_transactions_by_date_range(
-            db_session, start_date, end_date, user_id=None
-        ):
-            # Simulate query execution
-            query_result = await db_session.execute(MagicMock())
-            transactions = query_result.scalars().all()
+        await get_user_transactions(mock_db_session, user_id=1, status=hostile_status)
 
-            # Apply date filter
-            filtered_transactions = [
-                t for t in transactions if start_date <= t.created_at <= end_date
-            ]
+        query = mock_db_session.execute.call_args[0][0]
+        assert hostile_status not in str(query)
+        assert "transactions.status = :status_1" in str(query)
+        assert query.compile().params["status_1"] == hostile_status
 
-            # Apply user filter if provided
-            if user_id:
-                filtered_transactions = [
-                    t for t in filtered_transactions if t.user_id == user_id
-                ]
+    async def test_get_transactions_by_date_range(
+        self, mock_db_session, sample_user_transactions, frozen_now
+    ):
+        """Test transaction retrieval by date range."""
+        start_date = frozen_now - timedelta(days=7)
+        end_date = frozen_now
 
-            return filtered_transactions
+        # Mock database response - date and user filters happen in SQL
+        mock_result = mock_db_session.execute.return_value
+        mock_result.mappings.return_value.all.return_value = [
+            asdict(t)
+            for t in sample_user_transactions
+            if start_date <= t.created_at <= end_date and t.user_id == 1
+        ]
 
         result = await get_transactions_by_date_range(
             mock_db_session, start_date, end_date, user_id=1
         )
 
+        assert result
         for transaction in result:
-            assert start_date <= transaction.created_at <= end_date
-            assert transaction.user_id == 1
+            assert start_date <= transaction["created_at"] <= end_date
+            assert transaction["user_id"] == 1
+        mock_result.scalars.assert_not_called()
 
         mock_db_session.execute.assert_called_once()
 
-    async def test_calculate_transaction_statistics(
-        self, mock_db_session, sample_user_transactions
-    ):
-        """Test transaction statistics calculation."""
-        # Mock database response
-        mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = sample_user_transactions
-
-        mock_db_session.execute.return_value = mock_result
-
-        async def calculate_transaction_statistics(
-            db_session, user_id=None, date_from=None, date_to=None
-        ):
-            # Get transactions
-            query_result = await db_session.execute(MagicMock())
-            transactions = query_result.scalars().all()
-
-            # Apply filters
-            if user_id:
-                transactions = [t for t in transactions if t.user_id == user_id]
+        # Verify the filters are part of the query
+        params = mock_db_session.execute.call_args[0][0].compile().params
+        assert params["created_at_1"] == start_date
+        assert params["created_at_2"] == end_date
+        assert params["user_id_1"] == 1
 
-            if date_from:
-                transactions = [t for t in transactions if t.created_at >= date_from]
-
-            if date_to:
-                transactions = [t for t in transactions if t.created_at <= date_to]
+    async def test_calculate_transaction_statistics(self, mock_db_session):
+        """Test transaction statistics calculation."""
+        # Mock GROUP BY status rows: (status, count, sum(amount))
+        mock_result = mock_db_session.execute.return_value
+        mock_result.all.return_value = [
+            ("completed", 3, Decimal("300000")),
+            ("failed", 1, Decimal("50000")),
+            ("pending", 1, Decimal("20000")),
+        ]
 
-            # Calculate statistics
-            total_transactions = len(transactions)
-            completed_transactions = len(
-                [t for t in transactions if t.status == "completed"]
-            )
-            failed_transactions = len([t for t in transactions if t.status == "failed"])
-            pending_transactions = len(
-                [t for t in transactions if t.status == "pending"]
-            )
+        result = await calculate_transaction_statistics(mock_db_session, user_id=1)
 
-            total_amount = sum(
-                t.amount for t in transactions if t.status == "completed"
-            )
-            average_amount = (
-                total_amount / completed_transactions
-                if completed_transactions > 0
-                else 0
-            )
+        assert result["total_transactions"] == 5
+        assert result["completed_transactions"] == 3
+        assert result["failed_transactions"] == 1
+        assert result["pending_transactions"] == 1
+        assert result["total_amount"] == Decimal("300000")
+        assert result["average_amount"] == Decimal("100000")
+        assert result["success_rate"] == 60.0
 
-            success_rate = (
-                (completed_transactions / total_transactions * 100)
-                if total_transactions > 0
-                else 0
-            )
+        # Single aggregate round trip, grouped by status
+        mock_db_session.execute.assert_called_once()
+        query = mock_db_session.execute.call_args[0][0]
+        assert "GROUP BY transactions.status" in str(query)
+        assert query.compile().params["user_id_1"] == 1
 
-            return {
-                "total_transactions": total_transactions,
-                "completed_transactions": completed_transactions,
-                "failed_transactions": failed_transactions,
-                "pending_transactions": pending_transactions,
-                "total_amount": total_amount,
-                "average_amount": average_amount,
-                "success_rate": round(success_rate, 2),
-            }
+    async def test_calculate_transaction_statistics_empty(self, mock_db_session):
+        """Test transaction statistics with no matching transactions."""
+        mock_db_session.execute.return_value.all.return_value = []
 
         result = await calculate_transaction_statistics(mock_db_session, user_id=1)
 
-        assert "total_transactions" in result
-        assert "completed_transactions" in result
-        assert "failed_transactions" in result
-        assert "pending_transactions" in result
-        assert "total_amount" in result
-        assert "average_amount" in result
-        assert "success_rate" in result
-        assert 0 <= result["success_rate"] <= 100
-
-        mock_db_session.execute.assert_called_once()
+        assert result["total_transactions"] == 0
+        assert result["average_amount"] == 0
+        assert result["success_rate"] == 0
 
 
 @pytest.mark.asyncio
@@ -428,37 +728,16 @@ class TestBalanceCRUD:
     async def test_get_user_balance_success(self, mock_db_session, sample_balance_data):
         """Test successful user balance retrieval."""
         # Mock database response
-        mock_balance = MagicMock()
-        mock_balance.user_id = sample_balance_data["user_id"]
-        mock_balance.current_balance = sample_balance_data["current_balance"]
-        mock_balance.total_deposited = sample_balance_data["total_deposited"]
-        mock_balance.total_spent = sample_balance_data["total_spent"]
+        mock_balance = FakeBalance(
+            user_id=sample_balance_data["user_id"],
+            current_balance=sample_balance_data["current_balance"],
+            total_deposited=sample_balance_data["total_deposited"],
+            total_spent=sample_balance_data["total_spent"],
+        )
 
-        mock_result = MagicMock()
+        mock_result = mock_db_session.execute.return_value
         mock_result.scalar_one_or_none.return_value = mock_balance
 
-        mock_db_session.execute.return_value = mock_result
-
-        async def get_user_balance(db_session, user_id):
-            query_result = await db_session.execute(MagicMock())
-            balance = query_result.scalar_one_or_none()
-
-            if not balance:
-                # Create new balance record if doesn't exist
-                balance = MagicMock()
-                balance.user_id = user_id
-                balance.current_balance = Decimal("0")
-                balance.total_deposited = Decimal("0")
-                balance.total_spent = Decimal("0")
-                balance.created_at = datetime.utcnow()
-                balance.updated_at = datetime.utcnow()
-
-                db_session.add(balance)
-                await db_session.commit()
-                await db_session.refresh(balance)
-
-            return balance
-
         result = await get_user_balance(mock_db_session, 1)
 
         assert result.user_id == sample_balance_data["user_id"]
@@ -472,131 +751,91 @@ class TestBalanceCRUD:
         self, mock_db_session, sample_balance_data
     ):
         """Test successful balance update for deposit."""
-        # Mock existing balance
-        mock_balance = MagicMock()
-        mock_balance.user_id = sample_balance_data["user_id"]
-        mock_balance.current_balance = sample_balance_data["current_balance"]
-        mock_balance.total_deposited = sample_balance_data["total_deposited"]
-
-        mock_result = MagicMock()
-        mock_result.scalar_one_or_none.return_value = mock_balance
-
-        mock_db_session.execute.return_value = mock_result
-        mock_db_session.commit.return_value = None
-        mock_db_session.refresh.return_value = None
-
-        async def update_balance_deposit(db_session, user_id, amount):
-            if amount <= 0:
-                raise ValueError("Deposit amount must be positive")
-
-            # Get current balance
-            query_result = await db_session.execute(MagicMock())
-            balance = query_result.scalar_one_or_none()
-
-            if not balance:
-                raise ValueError("Balance record not found")
-
-            # Update balance
-            balance.current_balance += amount
-            balance.total_deposited += amount
-            balance.updated_at = datetime.utcnow()
-
-            await db_session.commit()
-            await db_session.refresh(balance)
-
-            return balance
-
         deposit_amount = Decimal("50000")
-        result = await update_balance_deposit(mock_db_session, 1, deposit_amount)
-
         expected_balance = sample_balance_data["current_balance"] + deposit_amount
         expected_total_deposited = (
             sample_balance_data["total_deposited"] + deposit_amount
         )
 
+        # Mock row returned by UPDATE ... RETURNING
+        mock_balance = FakeBalance(
+            user_id=sample_balance_data["user_id"],
+            current_balance=expected_balance,
+            total_deposited=expected_total_deposited,
+            total_spent=sample_balance_data["total_spent"],
+        )
+
+        mock_result = mock_db_session.execute.return_value
+        mock_result.one_or_none.return_value = mock_balance
+
+        result = await update_balance_deposit(mock_db_session, 1, deposit_amount)
+
         assert result.current_balance == expected_balance
         assert result.total_deposited == expected_total_deposited
 
-        mock_db_session.execute.assert_called_once()
-        mock_db_session.commit.assert_called_once()
-        mock_db_session.refresh.assert_called_once()
+        # One statement does the read and the write; RETURNING replaces refresh
+        assert mock_db_session.execute.call_count == 1
+        assert mock_db_session.commit.call_count == 1
+        assert mock_db_session.get.call_count == 0
+        assert mock_db_session.refresh.call_count == 0
+
+        query = mock_db_session.execute.call_args[0][0]
+        assert str(query).startswith("UPDATE balances SET")
+        assert "RETURNING" in str(query)
+
+        # The amount is bound once and added server-side
+        assert "balances.current_balance + :amount" in str(query)
+        assert query.compile().params["amount"] == deposit_amount
 
     async def test_update_balance_spend_success(
         self, mock_db_session, sample_balance_data
     ):
         """Test successful balance update for spending."""
-        # Mock existing balance with sufficient funds
-        mock_balance = MagicMock()
-        mock_balance.user_id = sample_balance_data["user_id"]
-        mock_balance.current_balance = Decimal("100000")  # Sufficient balance
-        mock_balance.total_spent = sample_balance_data["total_spent"]
-
-        mock_result = MagicMock()
-        mock_result.scalar_one_or_none.return_value = mock_balance
-
-        mock_db_session.execute.return_value = mock_result
-        mock_db_session.commit.return_value = None
-        mock_db_session.refresh.return_value = None
-
-        async def update_balance_spend(db_session, user_id, amount):
-            if amount <= 0:
-                raise ValueError("Spend amount must be positive")
-
-            # Get current balance
-            query_result = await db_session.execute(MagicMock())
-            balance = query_result.scalar_one_or_none()
-
-            if not balance:
-                raise ValueError("Balance record not found")
-
-            if balance.current_balance < amount:
-                raise ValueError("Insufficient balance")
-
-            # Update balance
-            balance.current_balance -= amount
-            balance.total_spent += amount
-            balance.updated_at = datetime.utcnow()
+        spend_amount = Decimal("30000")
+        expected_balance = Decimal("100000") - spend_amount
+        expected_total_spent = sample_balance_data["total_spent"] + spend_amount
 
-            await db_session.commit()
-            await db_session.refresh(balance)
+        # Mock row returned by UPDATE ... RETURNING
+        mock_balance = FakeBalance(
+            user_id=sample_balance_data["user_id"],
+            current_balance=expected_balance,
+            total_deposited=sample_balance_data["total_deposited"],
+            total_spent=expected_total_spent,
+        )
 
-            return balance
+        mock_result = mock_db_session.execute.return_value
+        mock_result.one_or_none.return_value = mock_balance
 
-        spend_amount = Decimal("30000")
         result = await update_balance_spend(mock_db_session, 1, spend_amount)
 
-        expected_balance = Decimal("100000") - spend_amount
-        expected_total_spent = sample_balance_data["total_spent"] + spend_amount
-
         assert result.current_balance == expected_balance
         assert result.total_spent == expected_total_spent
 
+        # One statement does the check, the read and the write
         mock_db_session.execute.assert_called_once()
         mock_db_session.commit.assert_called_once()
-        mock_db_session.refresh.assert_called_once()
+        mock_db_session.get.assert_not_called()
+        mock_db_session.refresh.assert_not_called()
 
-    async def test_update_balance_insufficient_funds(self, mock_db_session):
-        """Test balance update with insufficient funds."""
-        # Mock balance with insufficient funds
-        mock_balance = MagicMock()
-        mock_balance.user_id = 1
-        mock_balance.current_balance = Decimal("10000")  # Insufficient
-
-        mock_result = MagicMock()
-        mock_result.scalar_one_or_none.return_value = mock_balance
-
-        mock_db_session.execute.return_value = mock_result
+        # The amount is subtracted server-side
+        query = mock_db_session.execute.call_args[0][0]
+        assert "balances.current_balance - :amount" in str(query)
 
-        async def update_balance_spend(db_session, user_id, amount):
-            query_result = await db_session.execute(MagicMock())
-            balance = query_result.scalar_one_or_none()
+        # The funds check is part of the UPDATE's WHERE clause
+        where_clause = query.whereclause
+        assert "balances.current_balance >= :amount" in str(where_clause)
+        assert where_clause.compile().params["amount"] == spend_amount
 
-            if balance.current_balance < amount:
-                raise ValueError("Insufficient balance")
-
-            return balance
+    async def test_update_balance_insufficient_funds(self, mock_db_session):
+        """Test balance update with insufficient funds."""
+        # The guarded UPDATE matches no row when funds are insufficient
+        mock_result = mock_db_session.execute.return_value
+        mock_result.one_or_none.return_value = None
 
         spend_amount = Decimal("50000")  # More than available
 
         with pytest.raises(ValueError, match="Insufficient balance"):
             await update_balance_spend(mock_db_session, 1, spend_amount)
+
+        mock_db_session.execute.assert_called_once()
+        mock_db_session.commit.assert_not_called()
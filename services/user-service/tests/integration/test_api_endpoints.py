@@ -3,300 +3,223 @@ Integration tests for User Service API endpoints.
 """
 
 import asyncio
-import json
-from datetime import datetime, timedelta
-from unittest.mock import AsyncMock, patch
+import time
 
+import orjson
 import pytest
-from fastapi.testclient import TestClient
-from httpx import AsyncClient
 
 # Mock imports - these would be actual imports in real implementation
 # from user_service.main import app
 # from user_service.database import get_database
 # from user_service.models import User, UserRole, UserSession
 
+USER_HEADERS = {"Authorization": "Bearer valid_token"}
+ADMIN_HEADERS = {"Authorization": "Bearer admin_token"}
 
-@pytest.mark.asyncio
-class TestUserServiceAPIEndpoints:
-    """Integration tests for User Service API endpoints."""
-
-    @pytest.fixture
-    def mock_app(self):
-        """Mock FastAPI application for testing."""
-        from fastapi import Depends, FastAPI, HTTPException
-        from fastapi.security import HTTPBearer
-
-        app = FastAPI(title="User Service", version="1.0.0")
-        security = HTTPBearer()
-
-        # Mock database dependency
-        async def get_mock_db():
-            return AsyncMock()
-
-        # Mock authentication dependency
-        async def get_current_user(token: str = Depends(security)):
-            if token.credentials == "valid_token":
-                return {"user_id": 123, "email": "test@example.com", "role": "user"}
-            elif token.credentials == "admin_token":
-                return {"user_id": 456, "email": "admin@example.com", "role": "admin"}
-            else:
-                raise HTTPException(status_code=401, detail="Invalid token")
-
-        # Authentication endpoints
-        @app.post("/auth/register")
-        async def register(user_data: dict):
-            """Register new user endpoint."""
-            email = user_data.get("email")
-            password = user_data.get("password")
-            full_name = user_data.get("full_name")
-
-            # Validation
-            if not email or not password or not full_name:
-                raise HTTPException(status_code=400, detail="Missing required fields")
-
-            if "@" not in email:
-                raise HTTPException(status_code=400, detail="Invalid email format")
-
-            if len(password) < 8:
-                raise HTTPException(status_code=400, detail="Password too short")
-
-            # Mock user creation
-            new_user = {
-                "user_id": 789,
-                "email": email,
-                "full_name": full_name,
-                "role": "user",
-                "is_active": True,
-                "is_verified": False,
-                "created_at": datetime.utcnow().isoformat(),
-            }
-
-            return {
-                "success": True,
-                "message": "User registered successfully",
-                "user": new_user,
-                "verification_token": "verify_token_123",
-            }
-
-        @app.post("/auth/login")
-        async def login(credentials: dict):
-            """User login endpoint."""
-            email = credentials.get("email")
-            password = credentials.get("password")
-
-            if not email or not password:
-                raise HTTPException(
-                    status_code=400, detail="Email and password required"
-                )
-
-            # Mock authentication
-            if email == "test@example.com" and password == "password123":
-                return {
-                    "success": True,
-                    "message": "Login successful",
-                    "access_token": "valid_token",
-                    "token_type": "bearer",
-                    "expires_in": 3600,
-                    "user": {
-                        "user_id": 123,
-                        "email": email,
-                        "full_name": "Test User",
-                        "role": "user",
-                    },
-                }
-            elif email == "admin@example.com" and password == "admin123":
-                return {
-                    "success": True,
-                    "message": "Login successful",
-                    "access_token": "admin_token",
-                    "token_type": "bearer",
-                    "expires_in": 3600,
-                    "user": {
-                        "user_id": 456,
-                        "email": email,
-                        "full_name": "Admin User",
-                        "role": "admin",
-                    },
-                }
-            else:
-                raise HTTPException(status_code=401, detail="Invalid credentials")
-
-        @app.post("/auth/logout")
-        async def logout(current_user: dict = Depends(get_current_user)):
-            """User logout endpoint."""
-            return {"success": True, "message": "Logged out successfully"}
-
-        @app.post("/auth/verify-email")
-        async def verify_email(verification_data: dict):
-            """Email verification endpoint."""
-            token = verification_data.get("token")
-
-            if not token:
-                raise HTTPException(
-                    status_code=400, detail="Verification token required"
-                )
-
-            if token == "verify_token_123":
-                return {"success": True, "message": "Email verified successfully"}
-            else:
-                raise HTTPException(
-                    status_code=400, detail="Invalid verification token"
-                )
-
-        # User management endpoints
-        @app.get("/users/profile")
-        async def get_profile(current_user: dict = Depends(get_current_user)):
-            """Get user profile endpoint."""
-            return {
-                "success": True,
-                "user": {
-                    "user_id": current_user["user_id"],
-                    "email": current_user["email"],
-                    "full_name": "Test User"
-                    if current_user["user_id"] == 123
-                    else "Admin User",
-                    "role": current_user["role"],
-                    "is_active": True,
-                    "is_verified": True,
-                    "created_at": "2024-01-01T00:00:00",
-                    "last_login": "2024-12-15T10:00:00",
-                },
-            }
-
-        @app.put("/users/profile")
-        async def update_profile(
-            profile_data: dict, current_user: dict = Depends(get_current_user)
-        ):
-            """Update user profile endpoint."""
-            allowed_fields = ["full_name", "phone", "address"]
-            updates = {k: v for k, v in profile_data.items() if k in allowed_fields}
-
-            if not updates:
-                raise HTTPException(status_code=400, detail="No valid fields to update")
-
-            return {
-                "success": True,
-                "message": "Profile updated successfully",
-                "updated_fields": list(updates.keys()),
-            }
+# (payload, expected_status, expected_message) per endpoint; success messages
+# come from "message", error messages from "detail"
+REGISTRATION_CASES = [
+    pytest.param(
+        {
+            "email": "newuser@example.com",
+            "password": "newpassword123",
+            "full_name": "New User",
+        },
+        200,
+        "User registered successfully",
+        id="success",
+    ),
+    pytest.param(
+        # Missing password and full_name
+        {"email": "incomplete@example.com"},
+        400,
+        "Missing required fields",
+        id="missing_fields",
+    ),
+    pytest.param(
+        {"email": "invalid-email", "password": "password123", "full_name": "Test User"},
+        400,
+        "Invalid email format",
+        id="invalid_email",
+    ),
+    pytest.param(
+        {"email": "test@example.com", "password": "123", "full_name": "Test User"},
+        400,
+        "Password too short",
+        id="short_password",
+    ),
+]
+
+LOGIN_CASES = [
+    pytest.param(
+        {"email": "test@example.com", "password": "password123"},
+        200,
+        "Login successful",
+        id="user",
+    ),
+    pytest.param(
+        {"email": "admin@example.com", "password": "admin123"},
+        200,
+        "Login successful",
+        id="admin",
+    ),
+    pytest.param(
+        {"email": "test@example.com", "password": "wrongpassword"},
+        401,
+        "Invalid credentials",
+        id="invalid_credentials",
+    ),
+    pytest.param(
+        # Missing password
+        {"email": "test@example.com"},
+        400,
+        "Email and password required",
+        id="missing_fields",
+    ),
+]
+
+EMAIL_VERIFICATION_CASES = [
+    pytest.param(
+        {"token": "verify_token_123"}, 200, "Email verified successfully", id="success"
+    ),
+    pytest.param(
+        {"token": "invalid_token"},
+        400,
+        "Invalid verification token",
+        id="invalid_token",
+    ),
+    pytest.param({}, 400, "Verification token required", id="missing_token"),
+]
+
+# (payload, headers, expected_status, expected_message)
+CHANGE_PASSWORD_CASES = [
+    pytest.param(
+        {"current_password": "password123", "new_password": "newpassword456"},
+        USER_HEADERS,
+        200,
+        "Password changed successfully",
+        id="success",
+    ),
+    pytest.param(
+        {"current_password": "wrongpassword", "new_password": "newpassword456"},
+        USER_HEADERS,
+        400,
+        "Current password incorrect",
+        id="wrong_current_password",
+    ),
+    pytest.param(
+        {"current_password": "password123", "new_password": "123"},
+        USER_HEADERS,
+        400,
+        "New password too short",
+        id="short_new_password",
+    ),
+    pytest.param(
+        {"current_password": "password123", "new_password": "password123"},
+        USER_HEADERS,
+        400,
+        "New password must be different",
+        id="same_password",
+    ),
+    pytest.param(
+        {"current_password": "password123", "new_password": "newpassword456"},
+        None,
+        403,
+        "Not authenticated",
+        id="unauthenticated",
+    ),
+]
+
+# (user_id, payload, headers, expected_status, expected_message)
+ADMIN_USER_STATUS_CASES = [
+    pytest.param(
+        789,
+        {"is_active": True},
+        ADMIN_HEADERS,
+        200,
+        "User 789 activated successfully",
+        id="activate",
+    ),
+    pytest.param(
+        123,
+        {"is_active": False},
+        ADMIN_HEADERS,
+        200,
+        "User 123 deactivated successfully",
+        id="deactivate",
+    ),
+    pytest.param(
+        123,
+        {"some_other_field": "value"},
+        ADMIN_HEADERS,
+        400,
+        "is_active field required",
+        id="missing_is_active",
+    ),
+    pytest.param(
+        123,
+        {"is_active": False},
+        USER_HEADERS,
+        403,
+        "Admin access required",
+        id="non_admin",
+    ),
+    pytest.param(
+        123,
+        {"is_active": False},
+        None,
+        403,
+        "Not authenticated",
+        id="unauthenticated",
+    ),
+]
+
+
+@pytest.fixture(scope="module", params=[1, 10, 50])
+def concurrency(request):
+    """Number of requests issued at once by the concurrency tests."""
+    return request.param
+
+
+def _json(response):
+    """Decode a response body with orjson."""
+    return orjson.loads(response.content)
+
+
+def _assert_outcome(response, status, message):
+    """Assert the status code and the success or error message of a response."""
+    assert response.status_code == status
+
+    data = _json(response)
+    if status == 200:
+        assert data["success"] is True
+        assert data["message"] == message
+    else:
+        assert data["detail"] == message
 
-        @app.post("/users/change-password")
-        async def change_password(
-            password_data: dict, current_user: dict = Depends(get_current_user)
-        ):
-            """Change password endpoint."""
-            current_password = password_data.get("current_password")
-            new_password = password_data.get("new_password")
-
-            if not current_password or not new_password:
-                raise HTTPException(
-                    status_code=400, detail="Current and new password required"
-                )
-
-            if len(new_password) < 8:
-                raise HTTPException(status_code=400, detail="New password too short")
-
-            if current_password == new_password:
-                raise HTTPException(
-                    status_code=400, detail="New password must be different"
-                )
-
-            # Mock password validation
-            if current_password != "password123":
-                raise HTTPException(
-                    status_code=400, detail="Current password incorrect"
-                )
-
-            return {"success": True, "message": "Password changed successfully"}
-
-        # Admin endpoints
-        @app.get("/admin/users")
-        async def list_users(
-            page: int = 1,
-            limit: int = 10,
-            current_user: dict = Depends(get_current_user),
-        ):
-            """List users endpoint (admin only)."""
-            if current_user["role"] != "admin":
-                raise HTTPException(status_code=403, detail="Admin access required")
-
-            # Mock user list
-            users = [
-                {
-                    "user_id": 123,
-                    "email": "test@example.com",
-                    "full_name": "Test User",
-                    "role": "user",
-                    "is_active": True,
-                    "created_at": "2024-01-01T00:00:00",
-                },
-                {
-                    "user_id": 789,
-                    "email": "user2@example.com",
-                    "full_name": "User Two",
-                    "role": "user",
-                    "is_active": False,
-                    "created_at": "2024-01-02T00:00:00",
-                },
-            ]
-
-            # Apply pagination
-            start = (page - 1) * limit
-            end = start + limit
-            paginated_users = users[start:end]
-
-            return {
-                "success": True,
-                "users": paginated_users,
-                "pagination": {
-                    "page": page,
-                    "limit": limit,
-                    "total": len(users),
-                    "pages": (len(users) + limit - 1) // limit,
-                },
-            }
 
-        @app.put("/admin/users/{user_id}/status")
-        async def update_user_status(
-            user_id: int,
-            status_data: dict,
-            current_user: dict = Depends(get_current_user),
-        ):
-            """Update user status endpoint (admin only)."""
-            if current_user["role"] != "admin":
-                raise HTTPException(status_code=403, detail="Admin access required")
-
-            is_active = status_data.get("is_active")
-            if is_active is None:
-                raise HTTPException(status_code=400, detail="is_active field required")
-
-            return {
-                "success": True,
-                "message": f"User {user_id} {'activated' if is_active else 'deactivated'} successfully",
-            }
+class TestUserServiceAPIEndpoints:
+    """Integration tests for User Service API endpoints."""
 
-        return app
+    @pytest.mark.parametrize("payload, status, message", REGISTRATION_CASES)
+    def test_user_registration(self, sync_client, payload, status, message):
+        """Test user registration endpoint."""
+        response = sync_client.post("/auth/register", json=payload)
 
-    @pytest.fixture
-    async def client(self, mock_app):
-        """Create test client."""
-        async with AsyncClient(app=mock_app, base_url="http://test") as ac:
-            yield ac
+        _assert_outcome(response, status, message)
 
-    async def test_user_registration(self, client):
-        """Test user registration endpoint."""
-        # Test successful registration
+    def test_user_registration_returns_user(self, sync_client):
+        """Test successful registration returns the new user."""
         registration_data = {
             "email": "newuser@example.com",
             "password": "newpassword123",
             "full_name": "New User",
         }
 
-        response = await client.post("/auth/register", json=registration_data)
+        response = sync_client.post("/auth/register", json=registration_data)
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response)
         assert data["success"] is True
         assert "user" in data
         assert data["user"]["email"] == "newuser@example.com"
@@ -304,155 +227,81 @@ class TestUserServiceAPIEndpoints:
         assert data["user"]["role"] == "user"
         assert "verification_token" in data
 
-        # Test registration with missing fields
-        incomplete_data = {
-            "email": "incomplete@example.com"
-            # Missing password and full_name
-        }
-
-        response = await client.post("/auth/register", json=incomplete_data)
-        assert response.status_code == 400
-
-        data = response.json()
-        assert "Missing required fields" in data["detail"]
-
-        # Test registration with invalid email
-        invalid_email_data = {
-            "email": "invalid-email",
-            "password": "password123",
-            "full_name": "Test User",
-        }
-
-        response = await client.post("/auth/register", json=invalid_email_data)
-        assert response.status_code == 400
-
-        data = response.json()
-        assert "Invalid email format" in data["detail"]
-
-        # Test registration with short password
-        short_password_data = {
-            "email": "test@example.com",
-            "password": "123",
-            "full_name": "Test User",
-        }
-
-        response = await client.post("/auth/register", json=short_password_data)
-        assert response.status_code == 400
-
-        data = response.json()
-        assert "Password too short" in data["detail"]
-
-    async def test_user_login(self, client):
+    @pytest.mark.parametrize("payload, status, message", LOGIN_CASES)
+    def test_user_login(self, sync_client, payload, status, message):
         """Test user login endpoint."""
-        # Test successful login
-        login_data = {"email": "test@example.com", "password": "password123"}
-
-        response = await client.post("/auth/login", json=login_data)
+        response = sync_client.post("/auth/login", json=payload)
+
+        _assert_outcome(response, status, message)
+
+    @pytest.mark.parametrize(
+        "login_data, access_token, role",
+        [
+            (
+                {"email": "test@example.com", "password": "password123"},
+                "valid_token",
+                "user",
+            ),
+            (
+                {"email": "admin@example.com", "password": "admin123"},
+                "admin_token",
+                "admin",
+            ),
+        ],
+        ids=["user", "admin"],
+    )
+    def test_user_login_returns_token(
+        self, sync_client, login_data, access_token, role
+    ):
+        """Test successful login returns a bearer token and the user."""
+        response = sync_client.post("/auth/login", json=login_data)
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response)
         assert data["success"] is True
-        assert data["access_token"] == "valid_token"
+        assert data["access_token"] == access_token
         assert data["token_type"] == "bearer"
         assert data["expires_in"] == 3600
         assert "user" in data
-        assert data["user"]["email"] == "test@example.com"
-
-        # Test admin login
-        admin_login_data = {"email": "admin@example.com", "password": "admin123"}
-
-        response = await client.post("/auth/login", json=admin_login_data)
-        assert response.status_code == 200
-
-        data = response.json()
-        assert data["success"] is True
-        assert data["access_token"] == "admin_token"
-        assert data["user"]["role"] == "admin"
-
-        # Test login with invalid credentials
-        invalid_login_data = {"email": "test@example.com", "password": "wrongpassword"}
-
-        response = await client.post("/auth/login", json=invalid_login_data)
-        assert response.status_code == 401
+        assert data["user"]["email"] == login_data["email"]
+        assert data["user"]["role"] == role
 
-        data = response.json()
-        assert "Invalid credentials" in data["detail"]
-
-        # Test login with missing fields
-        incomplete_login_data = {
-            "email": "test@example.com"
-            # Missing password
-        }
-
-        response = await client.post("/auth/login", json=incomplete_login_data)
-        assert response.status_code == 400
-
-        data = response.json()
-        assert "Email and password required" in data["detail"]
-
-    async def test_user_logout(self, client):
+    def test_user_logout(self, sync_client):
         """Test user logout endpoint."""
         # Test successful logout with valid token
-        headers = {"Authorization": "Bearer valid_token"}
 
-        response = await client.post("/auth/logout", headers=headers)
+        response = sync_client.post("/auth/logout", headers=USER_HEADERS)
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response)
         assert data["success"] is True
-        assert "Logged out successfully" in data["message"]
+        assert data["message"] == "Logged out successfully"
 
         # Test logout without token
-        response = await client.post("/auth/logout")
+        response = sync_client.post("/auth/logout")
         assert response.status_code == 403  # FastAPI returns 403 for missing auth
 
         # Test logout with invalid token
         invalid_headers = {"Authorization": "Bearer invalid_token"}
 
-        response = await client.post("/auth/logout", headers=invalid_headers)
+        response = sync_client.post("/auth/logout", headers=invalid_headers)
         assert response.status_code == 401
 
-    async def test_email_verification(self, client):
+    @pytest.mark.parametrize("payload, status, message", EMAIL_VERIFICATION_CASES)
+    def test_email_verification(self, sync_client, payload, status, message):
         """Test email verification endpoint."""
-        # Test successful verification
-        verification_data = {"token": "verify_token_123"}
-
-        response = await client.post("/auth/verify-email", json=verification_data)
-        assert response.status_code == 200
-
-        data = response.json()
-        assert data["success"] is True
-        assert "Email verified successfully" in data["message"]
-
-        # Test verification with invalid token
-        invalid_verification_data = {"token": "invalid_token"}
-
-        response = await client.post(
-            "/auth/verify-email", json=invalid_verification_data
-        )
-        assert response.status_code == 400
-
-        data = response.json()
-        assert "Invalid verification token" in data["detail"]
+        response = sync_client.post("/auth/verify-email", json=payload)
 
-        # Test verification without token
-        empty_verification_data = {}
+        _assert_outcome(response, status, message)
 
-        response = await client.post("/auth/verify-email", json=empty_verification_data)
-        assert response.status_code == 400
-
-        data = response.json()
-        assert "Verification token required" in data["detail"]
-
-    async def test_get_user_profile(self, client):
+    def test_get_user_profile(self, sync_client):
         """Test get user profile endpoint."""
         # Test getting profile with valid token
-        headers = {"Authorization": "Bearer valid_token"}
 
-        response = await client.get("/users/profile", headers=headers)
+        response = sync_client.get("/users/profile", headers=USER_HEADERS)
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response)
         assert data["success"] is True
         assert "user" in data
 
@@ -464,29 +313,27 @@ class TestUserServiceAPIEndpoints:
         assert user["is_verified"] is True
 
         # Test getting admin profile
-        admin_headers = {"Authorization": "Bearer admin_token"}
 
-        response = await client.get("/users/profile", headers=admin_headers)
+        response = sync_client.get("/users/profile", headers=ADMIN_HEADERS)
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response)
         user = data["user"]
         assert user["user_id"] == 456
         assert user["role"] == "admin"
 
         # Test getting profile without token
-        response = await client.get("/users/profile")
+        response = sync_client.get("/users/profile")
         assert response.status_code == 403
 
         # Test getting profile with invalid token
         invalid_headers = {"Authorization": "Bearer invalid_token"}
 
-        response = await client.get("/users/profile", headers=invalid_headers)
+        response = sync_client.get("/users/profile", headers=invalid_headers)
         assert response.status_code == 401
 
-    async def test_update_user_profile(self, client):
+    def test_update_user_profile(self, sync_client):
         """Test update user profile endpoint."""
-        headers = {"Authorization": "Bearer valid_token"}
 
         # Test successful profile update
         update_data = {
@@ -495,12 +342,14 @@ class TestUserServiceAPIEndpoints:
             "address": "123 Test Street, Ho Chi Minh City",
         }
 
-        response = await client.put("/users/profile", json=update_data, headers=headers)
+        response = sync_client.put(
+            "/users/profile", json=update_data, headers=USER_HEADERS
+        )
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response)
         assert data["success"] is True
-        assert "Profile updated successfully" in data["message"]
+        assert data["message"] == "Profile updated successfully"
         assert "updated_fields" in data
         assert "full_name" in data["updated_fields"]
         assert "phone" in data["updated_fields"]
@@ -512,89 +361,35 @@ class TestUserServiceAPIEndpoints:
             "role": "admin",  # Not allowed to update
         }
 
-        response = await client.put(
-            "/users/profile", json=invalid_update_data, headers=headers
+        response = sync_client.put(
+            "/users/profile", json=invalid_update_data, headers=USER_HEADERS
         )
         assert response.status_code == 400
 
-        data = response.json()
-        assert "No valid fields to update" in data["detail"]
+        data = _json(response)
+        assert data["detail"] == "No valid fields to update"
 
         # Test update without authentication
-        response = await client.put("/users/profile", json=update_data)
+        response = sync_client.put("/users/profile", json=update_data)
         assert response.status_code == 403
 
-    async def test_change_password(self, client):
+    @pytest.mark.parametrize("payload, headers, status, message", CHANGE_PASSWORD_CASES)
+    def test_change_password(self, sync_client, payload, headers, status, message):
         """Test change password endpoint."""
-        headers = {"Authorization": "Bearer valid_token"}
-
-        # Test successful password change
-        password_data = {
-            "current_password": "password123",
-            "new_password": "newpassword456",
-        }
-
-        response = await client.post(
-            "/users/change-password", json=password_data, headers=headers
+        response = sync_client.post(
+            "/users/change-password", json=payload, headers=headers
         )
-        assert response.status_code == 200
-
-        data = response.json()
-        assert data["success"] is True
-        assert "Password changed successfully" in data["message"]
 
-        # Test password change with incorrect current password
-        wrong_password_data = {
-            "current_password": "wrongpassword",
-            "new_password": "newpassword456",
-        }
-
-        response = await client.post(
-            "/users/change-password", json=wrong_password_data, headers=headers
-        )
-        assert response.status_code == 400
+        _assert_outcome(response, status, message)
 
-        data = response.json()
-        assert "Current password incorrect" in data["detail"]
-
-        # Test password change with short new password
-        short_password_data = {"current_password": "password123", "new_password": "123"}
-
-        response = await client.post(
-            "/users/change-password", json=short_password_data, headers=headers
-        )
-        assert response.status_code == 400
-
-        data = response.json()
-        assert "New password too short" in data["detail"]
-
-        # Test password change with same password
-        same_password_data = {
-            "current_password": "password123",
-            "new_password": "password123",
-        }
-
-        response = await client.post(
-            "/users/change-password", json=same_password_data, headers=headers
-        )
-        assert response.status_code == 400
-
-        data = response.json()
-        assert "New password must be different" in data["detail"]
-
-        # Test password change without authentication
-        response = await client.post("/users/change-password", json=password_data)
-        assert response.status_code == 403
-
-    async def test_admin_list_users(self, client):
+    def test_admin_list_users(self, sync_client):
         """Test admin list users endpoint."""
-        admin_headers = {"Authorization": "Bearer admin_token"}
 
         # Test successful user listing
-        response = await client.get("/admin/users", headers=admin_headers)
+        response = sync_client.get("/admin/users", headers=ADMIN_HEADERS)
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response)
         assert data["success"] is True
         assert "users" in data
         assert "pagination" in data
@@ -610,12 +405,10 @@ class TestUserServiceAPIEndpoints:
         assert pagination["total"] == 2
 
         # Test user listing with pagination
-        response = await client.get(
-            "/admin/users?page=1&limit=1", headers=admin_headers
-        )
+        response = sync_client.get("/admin/users?page=1&limit=1", headers=ADMIN_HEADERS)
         assert response.status_code == 200
 
-        data = response.json()
+        data = _json(response)
         users = data["users"]
         assert len(users) == 1  # Limited to 1 user per page
 
@@ -625,78 +418,37 @@ class TestUserServiceAPIEndpoints:
         assert pagination["pages"] == 2  # 2 users / 1 per page = 2 pages
 
         # Test user listing with non-admin user
-        user_headers = {"Authorization": "Bearer valid_token"}
 
-        response = await client.get("/admin/users", headers=user_headers)
+        response = sync_client.get("/admin/users", headers=USER_HEADERS)
         assert response.status_code == 403
 
-        data = response.json()
-        assert "Admin access required" in data["detail"]
+        data = _json(response)
+        assert data["detail"] == "Admin access required"
 
         # Test user listing without authentication
-        response = await client.get("/admin/users")
+        response = sync_client.get("/admin/users")
         assert response.status_code == 403
 
-    async def test_admin_update_user_status(self, client):
+    @pytest.mark.parametrize(
+        "user_id, payload, headers, status, message", ADMIN_USER_STATUS_CASES
+    )
+    def test_admin_update_user_status(
+        self, sync_client, user_id, payload, headers, status, message
+    ):
         """Test admin update user status endpoint."""
-        admin_headers = {"Authorization": "Bearer admin_token"}
-
-        # Test successful user activation
-        status_data = {"is_active": True}
-
-        response = await client.put(
-            "/admin/users/789/status", json=status_data, headers=admin_headers
-        )
-        assert response.status_code == 200
-
-        data = response.json()
-        assert data["success"] is True
-        assert "User 789 activated successfully" in data["message"]
-
-        # Test successful user deactivation
-        status_data = {"is_active": False}
-
-        response = await client.put(
-            "/admin/users/123/status", json=status_data, headers=admin_headers
+        response = sync_client.put(
+            f"/admin/users/{user_id}/status", json=payload, headers=headers
         )
-        assert response.status_code == 200
-
-        data = response.json()
-        assert data["success"] is True
-        assert "User 123 deactivated successfully" in data["message"]
 
-        # Test update without is_active field
-        invalid_status_data = {"some_other_field": "value"}
-
-        response = await client.put(
-            "/admin/users/123/status", json=invalid_status_data, headers=admin_headers
-        )
-        assert response.status_code == 400
-
-        data = response.json()
-        assert "is_active field required" in data["detail"]
-
-        # Test update with non-admin user
-        user_headers = {"Authorization": "Bearer valid_token"}
-
-        response = await client.put(
-            "/admin/users/123/status", json=status_data, headers=user_headers
-        )
-        assert response.status_code == 403
-
-        data = response.json()
-        assert "Admin access required" in data["detail"]
-
-        # Test update without authentication
-        response = await client.put("/admin/users/123/status", json=status_data)
-        assert response.status_code == 403
+        _assert_outcome(response, status, message)
 
 
 @pytest.mark.asyncio
+@pytest.mark.xdist_group(name="user_api")
 class TestUserServicePerformance:
     """Performance tests for User Service API endpoints."""
 
-    async def test_concurrent_user_registrations(self, client):
+    async def test_concurrent_user_registrations(self, client, concurrency):
         """Test concurrent user registrations."""
 
         async def register_user(user_id):
@@ -709,11 +461,11 @@ class TestUserServicePerformance:
             response = await client.post("/auth/register", json=registration_data)
             return response.status_code == 200
 
-        # Test 10 concurrent registrations
-        tasks = [register_user(i) for i in range(10)]
+        tasks = (register_user(i) for i in range(concurrency))
         results = await asyncio.gather(*tasks)
 
         # All registrations should succeed
+        assert len(results) == concurrency
         assert all(results)
 
     async def test_concurrent_logins(self, client):
@@ -734,8 +486,6 @@ class TestUserServicePerformance:
 
     async def test_api_response_times(self, client):
         """Test API response times."""
-        import time
-
         # Test login response time
         start_time = time.time()
 
@@ -750,10 +500,9 @@ class TestUserServicePerformance:
         assert response_time < 1.0  # Should respond within 1 second
 
         # Test profile retrieval response time
-        headers = {"Authorization": "Bearer valid_token"}
 
         start_time = time.time()
-        response = await client.get("/users/profile", headers=headers)
+        response = await client.get("/users/profile", headers=USER_HEADERS)
         end_time = time.time()
         response_time = end_time - start_time
 
@@ -762,14 +511,15 @@ class TestUserServicePerformance:
 
 
 @pytest.mark.asyncio
+@pytest.mark.xdist_group(name="user_api")
 class TestUserServiceSecurity:
     """Security tests for User Service API endpoints."""
 
-    async def test_sql_injection_protection(self, client):
+    async def test_sql_injection_protection(self, client, sqli_payload):
         """Test SQL injection protection."""
         # Test SQL injection in login
         malicious_login_data = {
-            "email": "admin@example.com'; DROP TABLE users; --",
+            "email": f"admin@example.com{sqli_payload}",
             "password": "password123",
         }
 
@@ -779,7 +529,7 @@ class TestUserServiceSecurity:
 
         # Test SQL injection in registration
         malicious_registration_data = {
-            "email": "test'; INSERT INTO users (email) VALUES ('hacker@evil.com'); --@example.com",
+            "email": f"test{sqli_payload}@example.com",
             "password": "password123",
             "full_name": "Malicious User",
         }
@@ -788,25 +538,21 @@ class TestUserServiceSecurity:
         # Should handle gracefully
         assert response.status_code in [400, 422]
 
-    async def test_xss_protection(self, client):
+    async def test_xss_protection(self, client, xss_payload):
         """Test XSS protection."""
-        headers = {"Authorization": "Bearer valid_token"}
 
         # Test XSS in profile update
-        xss_update_data = {
-            "full_name": "<script>alert('XSS')</script>",
-            "address": "<img src=x onerror=alert('XSS')>",
-        }
+        xss_update_data = {"full_name": xss_payload, "address": xss_payload}
 
         response = await client.put(
-            "/users/profile", json=xss_update_data, headers=headers
+            "/users/profile", json=xss_update_data, headers=USER_HEADERS
         )
 
         # Should accept the request but sanitize the data
         assert response.status_code == 200
 
         # In a real implementation, the response should show sanitized data
-        data = response.json()
+        data = _json(response)
         assert data["success"] is True
 
     async def test_rate_limiting_simulation(self, client):
@@ -814,14 +560,14 @@ class TestUserServiceSecurity:
         # Simulate rapid login attempts
         login_data = {"email": "test@example.com", "password": "wrongpassword"}
 
-        # Make multiple rapid requests
-        responses = []
-        for _ in range(10):
-            response = await client.post("/auth/login", json=login_data)
-            responses.append(response.status_code)
+        # Make multiple rapid requests at once
+        responses = await asyncio.gather(
+            *(client.post("/auth/login", json=login_data) for _ in range(10))
+        )
 
         # All should return 401 (unauthorized) but service should remain stable
-        assert all(status == 401 for status in responses)
+        assert len(responses) == 10
+        assert all(response.status_code == 401 for response in responses)
 
     async def test_token_validation(self, client):
         """Test JWT token validation."""
@@ -2,13 +2,15 @@
 Unit tests for User Service authentication functionality.
 """
 
-from datetime import datetime, timedelta
-from unittest.mock import AsyncMock, MagicMock, patch
+import hmac
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
 
+import bcrypt
 import jwt
 import pytest
 from fastapi import HTTPException
-from passlib.context import CryptContext
 
 # Mock imports - these would be actual imports in real implementation
 # from user_service.auth import AuthService, JWTManager, PasswordManager
@@ -16,65 +18,93 @@ from passlib.context import CryptContext
 # from user_service.schemas import UserLogin, UserCreate
 
 
+# Minimum bcrypt cost; hashes stay verifiable and 60 characters long
+_BCRYPT_ROUNDS = 4
+
+
+def _hash_password(password: str) -> str:
+    """Hash a password with bcrypt directly, bypassing passlib's dispatch."""
+    return bcrypt.hashpw(
+        password.encode(), bcrypt.gensalt(rounds=_BCRYPT_ROUNDS)
+    ).decode()
+
+
+def _verify_password(password: str, hashed: str) -> bool:
+    """Check a password against a bcrypt hash."""
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+
+_PASSWORD_SPECIAL_CHARS = frozenset("!@#$%^&*()_+-=[]{}|;:,.<>?")
+
+
+def validate_password_strength(password: str) -> bool:
+    """Mock password strength validator."""
+    # str.isupper()/islower() are Unicode-aware, so Vietnamese letters count
+    return (
+        len(password) >= 8
+        and any(c.isupper() for c in password)
+        and any(c.islower() for c in password)
+        and any(c.isdigit() for c in password)
+        and any(c in _PASSWORD_SPECIAL_CHARS for c in password)
+    )
+
+
+def _fake_hash(password: str) -> str:
+    """Reversible stand-in for a password hash."""
+    return f"fake:{password}"
+
+
+def _fake_verify(password: str, hashed: str) -> bool:
+    """Check a password against a _fake_hash result."""
+    return hashed == f"fake:{password}"
+
+
+# Auth-flow tests only need hash/verify semantics; bcrypt itself is covered by
+# TestPasswordManager
+_FAKE_PWD_CONTEXT = SimpleNamespace(hash=_fake_hash, verify=_fake_verify)
+
+
 class TestPasswordManager:
     """Test password hashing and verification."""
 
-    def setup_method(self):
-        """Setup test fixtures."""
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
     def test_hash_password(self):
         """Test password hashing."""
         password = "TestPassword123!"
-        hashed = self.pwd_context.hash(password)
+        hashed = _hash_password(password)
 
         assert hashed != password
-        assert self.pwd_context.verify(password, hashed)
+        assert _verify_password(password, hashed)
         assert len(hashed) > 50  # Bcrypt hashes are typically 60 characters
-
-    def test_verify_password_correct(self):
-        """Test password verification with correct password."""
-        password = "TestPassword123!"
-        hashed = self.pwd_context.hash(password)
-
-        assert self.pwd_context.verify(password, hashed) is True
-
-    def test_verify_password_incorrect(self):
-        """Test password verification with incorrect password."""
-        password = "TestPassword123!"
-        wrong_password = "WrongPassword456!"
-        hashed = self.pwd_context.hash(password)
-
-        assert self.pwd_context.verify(wrong_password, hashed) is False
+        assert hashed.startswith("$2b$04$")
+
+    @pytest.fixture(scope="class")
+    def hashed_test_password(self):
+        """Hash of "TestPassword123!", computed once for the class."""
+        return _hash_password("TestPassword123!")
+
+    @pytest.mark.parametrize(
+        "candidate, expected",
+        [("TestPassword123!", True), ("WrongPassword456!", False)],
+        ids=["correct", "incorrect"],
+    )
+    def test_verify_password(self, hashed_test_password, candidate, expected):
+        """Test password verification against a stored hash."""
+        assert _verify_password(candidate, hashed_test_password) is expected
+
+    def test_weak_password_rejected(self, weak_password):
+        """Test password strength validation rejects weak passwords."""
+        assert validate_password_strength(weak_password) is False
 
     def test_password_strength_validation(self):
         """Test password strength validation."""
-        weak_passwords = ["123456", "password", "abc123", "12345678", "qwerty"]
-
         strong_passwords = [
             "TestPassword123!",
             "MySecure@Pass2024",
             "Complex#Password99",
             "Strong$Pass#123",
+            "Đăngnhập1!",
         ]
 
-        def validate_password_strength(password: str) -> bool:
-            """Mock password strength validator."""
-            if len(password) < 8:
-                return False
-            if not any(c.isupper() for c in password):
-                return False
-            if not any(c.islower() for c in password):
-                return False
-            if not any(c.isdigit() for c in password):
-                return False
-            if not any(c in "!@#$%^&*()_+-=[]{}|;:,.<>?" for c in password):
-                return False
-            return True
-
-        for password in weak_passwords:
-            assert validate_password_strength(password) is False
-
         for password in strong_passwords:
             assert validate_password_strength(password) is True
 
@@ -82,94 +112,75 @@ class TestPasswordManager:
 class TestJWTManager:
     """Test JWT token creation and validation."""
 
-    def setup_method(self):
-        """Setup test fixtures."""
-        self.secret_key = "test-secret-key"
-        self.algorithm = "HS256"
-        self.access_token_expire_minutes = 30
-        self.refresh_token_expire_days = 7
+    secret_key = "test-secret-key"
+    algorithm = "HS256"
+    access_token_expire_minutes = 30
+    refresh_token_expire_days = 7
+
+    # Tokens are signed once per class; the tests below only decode them
+    @pytest.fixture(scope="class")
+    def access_token(self, jwt_payload_factory):
+        """Access token and the payload it was signed from."""
+        now = datetime.now(timezone.utc)
+        payload = jwt_payload_factory(
+            exp=now + timedelta(minutes=self.access_token_expire_minutes),
+            iat=now,
+            type="access",
+        )
+        return jwt.encode(payload, self.secret_key, algorithm=self.algorithm), payload
+
+    @pytest.fixture(scope="class")
+    def refresh_token(self, jwt_payload_factory):
+        """Refresh token and the payload it was signed from."""
+        now = datetime.now(timezone.utc)
+        payload = jwt_payload_factory(
+            exp=now + timedelta(days=self.refresh_token_expire_days),
+            iat=now,
+            type="refresh",
+        )
+        return jwt.encode(payload, self.secret_key, algorithm=self.algorithm), payload
 
-    def test_create_access_token(self):
+    def test_create_access_token(self, access_token):
         """Test access token creation."""
-        user_data = {"user_id": 1, "email": "test@example.com", "role": "user"}
-
-        token = jwt.encode(
-            {
-                **user_data,
-                "exp": datetime.utcnow()
-                + timedelta(minutes=self.access_token_expire_minutes),
-                "iat": datetime.utcnow(),
-                "type": "access",
-            },
-            self.secret_key,
-            algorithm=self.algorithm,
-        )
+        token, payload = access_token
 
         assert isinstance(token, str)
         assert len(token) > 100  # JWT tokens are typically long
 
         # Decode and verify
         decoded = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-        assert decoded["user_id"] == user_data["user_id"]
-        assert decoded["email"] == user_data["email"]
-        assert decoded["role"] == user_data["role"]
+        assert decoded["user_id"] == payload["user_id"]
+        assert decoded["email"] == payload["email"]
+        assert decoded["role"] == payload["role"]
         assert decoded["type"] == "access"
 
-    def test_create_refresh_token(self):
+    def test_create_refresh_token(self, refresh_token):
         """Test refresh token creation."""
-        user_data = {"user_id": 1, "email": "test@example.com"}
-
-        token = jwt.encode(
-            {
-                **user_data,
-                "exp": datetime.utcnow()
-                + timedelta(days=self.refresh_token_expire_days),
-                "iat": datetime.utcnow(),
-                "type": "refresh",
-            },
-            self.secret_key,
-            algorithm=self.algorithm,
-        )
+        token, payload = refresh_token
 
         assert isinstance(token, str)
 
         # Decode and verify
         decoded = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-        assert decoded["user_id"] == user_data["user_id"]
-        assert decoded["email"] == user_data["email"]
+        assert decoded["user_id"] == payload["user_id"]
+        assert decoded["email"] == payload["email"]
         assert decoded["type"] == "refresh"
 
-    def test_decode_valid_token(self):
+    def test_decode_valid_token(self, access_token):
         """Test decoding valid token."""
-        payload = {
-            "user_id": 1,
-            "email": "test@example.com",
-            "role": "user",
-            "exp": datetime.utcnow() + timedelta(minutes=30),
-            "iat": datetime.utcnow(),
-            "type": "access",
-        }
-
-        token = jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
+        token, payload = access_token
+
         decoded = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
 
         assert decoded["user_id"] == payload["user_id"]
         assert decoded["email"] == payload["email"]
         assert decoded["role"] == payload["role"]
 
-    def test_decode_expired_token(self):
+    def test_decode_expired_token(self, signed_jwt_token):
         """Test decoding expired token."""
-        payload = {
-            "user_id": 1,
-            "email": "test@example.com",
-            "exp": datetime.utcnow() - timedelta(minutes=1),  # Expired
-            "iat": datetime.utcnow() - timedelta(minutes=31),
-        }
-
-        token = jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
-
+        # The session-signed sample payload expired in 2009
         with pytest.raises(jwt.ExpiredSignatureError):
-            jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+            jwt.decode(signed_jwt_token, self.secret_key, algorithms=[self.algorithm])
 
     def test_decode_invalid_token(self):
         """Test decoding invalid token."""
@@ -178,42 +189,58 @@ class TestJWTManager:
         with pytest.raises(jwt.DecodeError):
             jwt.decode(invalid_token, self.secret_key, algorithms=[self.algorithm])
 
-    def test_decode_token_wrong_secret(self):
+    def test_decode_token_wrong_secret(self, access_token):
         """Test decoding token with wrong secret."""
-        payload = {
-            "user_id": 1,
-            "email": "test@example.com",
-            "exp": datetime.utcnow() + timedelta(minutes=30),
-        }
-
-        token = jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
+        token, _ = access_token
         wrong_secret = "wrong-secret-key"
 
         with pytest.raises(jwt.InvalidSignatureError):
             jwt.decode(token, wrong_secret, algorithms=[self.algorithm])
 
+    def test_decode_tampered_signature_constant_time(self, access_token):
+        """Test tampered signatures are rejected with a constant-time comparison."""
+        token, payload = access_token
+        forged = jwt.encode(payload, "attacker-secret-key", algorithm=self.algorithm)
+
+        # Same header and claims, signature from a different key
+        signing_input = token.rsplit(".", 1)[0]
+        tampered = f"{signing_input}.{forged.rsplit('.', 1)[1]}"
+        assert tampered != token
+
+        # A plain == would exit on the first differing byte and leak timing
+        with patch(
+            "jwt.algorithms.hmac.compare_digest", wraps=hmac.compare_digest
+        ) as compare_digest:
+            with pytest.raises(jwt.InvalidSignatureError):
+                jwt.decode(tampered, self.secret_key, algorithms=[self.algorithm])
+
+        compare_digest.assert_called_once()
+
 
 @pytest.mark.asyncio
 class TestAuthService:
     """Test authentication service functionality."""
 
-    def setup_method(self):
-        """Setup test fixtures."""
-        self.mock_db = AsyncMock()
-        self.mock_redis = AsyncMock()
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = _FAKE_PWD_CONTEXT
 
-    async def test_authenticate_user_success(self, sample_user_data, sample_login_data):
+    async def test_authenticate_user_success(
+        self,
+        sample_user_data,
+        sample_login_data,
+        make_user,
+        stub_db,
+    ):
         """Test successful user authentication."""
         # Mock user from database
-        mock_user = MagicMock()
-        mock_user.id = 1
-        mock_user.email = sample_user_data["email"]
-        mock_user.password_hash = self.pwd_context.hash(sample_user_data["password"])
-        mock_user.is_active = True
-        mock_user.is_verified = True
+        mock_user = make_user(
+            id=1,
+            email=sample_user_data["email"],
+            password_hash=self.pwd_context.hash(sample_user_data["password"]),
+            is_active=True,
+            is_verified=True,
+        )
 
-        self.mock_db.scalar.return_value = mock_user
+        stub_db.scalar_result = mock_user
 
         # Mock authentication function
         async def authenticate_user(db, email: str, password: str):
@@ -223,7 +250,7 @@ class TestAuthService:
             return None
 
         result = await authenticate_user(
-            self.mock_db, sample_login_data["email"], sample_login_data["password"]
+            stub_db, sample_login_data["email"], sample_login_data["password"]
         )
 
         assert result is not None
@@ -231,15 +258,20 @@ class TestAuthService:
         assert result.is_active is True
 
     async def test_authenticate_user_wrong_password(
-        self, sample_user_data, sample_login_data
+        self,
+        sample_user_data,
+        sample_login_data,
+        make_user,
+        stub_db,
     ):
         """Test authentication with wrong password."""
         # Mock user from database
-        mock_user = MagicMock()
-        mock_user.email = sample_user_data["email"]
-        mock_user.password_hash = self.pwd_context.hash(sample_user_data["password"])
+        mock_user = make_user(
+            email=sample_user_data["email"],
+            password_hash=self.pwd_context.hash(sample_user_data["password"]),
+        )
 
-        self.mock_db.scalar.return_value = mock_user
+        stub_db.scalar_result = mock_user
 
         # Mock authentication function
         async def authenticate_user(db, email: str, password: str):
@@ -250,14 +282,14 @@ class TestAuthService:
 
         wrong_login_data = {**sample_login_data, "password": "WrongPassword123!"}
         result = await authenticate_user(
-            self.mock_db, wrong_login_data["email"], wrong_login_data["password"]
+            stub_db, wrong_login_data["email"], wrong_login_data["password"]
         )
 
         assert result is None
 
-    async def test_authenticate_user_not_found(self, sample_login_data):
+    async def test_authenticate_user_not_found(self, sample_login_data, stub_db):
         """Test authentication with non-existent user."""
-        self.mock_db.scalar.return_value = None
+        stub_db.scalar_result = None
 
         # Mock authentication function
         async def authenticate_user(db, email: str, password: str):
@@ -265,22 +297,27 @@ class TestAuthService:
             return user
 
         result = await authenticate_user(
-            self.mock_db, sample_login_data["email"], sample_login_data["password"]
+            stub_db, sample_login_data["email"], sample_login_data["password"]
         )
 
         assert result is None
 
     async def test_authenticate_inactive_user(
-        self, sample_user_data, sample_login_data
+        self,
+        sample_user_data,
+        sample_login_data,
+        make_user,
+        stub_db,
     ):
         """Test authentication with inactive user."""
         # Mock inactive user
-        mock_user = MagicMock()
-        mock_user.email = sample_user_data["email"]
-        mock_user.password_hash = self.pwd_context.hash(sample_user_data["password"])
-        mock_user.is_active = False
+        mock_user = make_user(
+            email=sample_user_data["email"],
+            password_hash=self.pwd_context.hash(sample_user_data["password"]),
+            is_active=False,
+        )
 
-        self.mock_db.scalar.return_value = mock_user
+        stub_db.scalar_result = mock_user
 
         # Mock authentication function that checks is_active
         async def authenticate_user(db, email: str, password: str):
@@ -294,16 +331,15 @@ class TestAuthService:
             return None
 
         result = await authenticate_user(
-            self.mock_db, sample_login_data["email"], sample_login_data["password"]
+            stub_db, sample_login_data["email"], sample_login_data["password"]
         )
 
         assert result is None
 
-    async def test_login_rate_limiting(self, sample_login_data):
+    async def test_login_rate_limiting(self, sample_login_data, spy_rate_limiter):
         """Test login rate limiting."""
         # Mock rate limiter
-        mock_rate_limiter = MagicMock()
-        mock_rate_limiter.is_allowed.return_value = False
+        spy_rate_limiter.is_allowed.return_value = False
 
         # Mock login function with rate limiting
         async def login_with_rate_limit(email: str, password: str, rate_limiter):
@@ -316,13 +352,16 @@ class TestAuthService:
             await login_with_rate_limit(
                 sample_login_data["email"],
                 sample_login_data["password"],
-                mock_rate_limiter,
+                spy_rate_limiter,
             )
 
         assert exc_info.value.status_code == 429
-        assert "Too many login attempts" in str(exc_info.value.detail)
+        assert exc_info.value.detail == "Too many login attempts"
+        spy_rate_limiter.is_allowed.assert_called_once_with(
+            f"login:{sample_login_data['email']}"
+        )
 
-    async def test_session_creation(self, sample_session_data):
+    async def test_session_creation(self, sample_session_data, frozen_now):
         """Test user session creation."""
 
         # Mock session creation
@@ -332,7 +371,7 @@ class TestAuthService:
                 "user_id": user_id,
                 "device_info": device_info,
                 "ip_address": ip_address,
-                "created_at": datetime.utcnow(),
+                "created_at": frozen_now,
                 "is_active": True,
             }
             return session_data
@@ -348,7 +387,7 @@ class TestAuthService:
         assert session["ip_address"] == sample_session_data["ip_address"]
         assert session["is_active"] is True
 
-    async def test_logout_session_invalidation(self):
+    async def test_logout_session_invalidation(self, mock_redis):
         """Test session invalidation on logout."""
         session_id = "session_123"
 
@@ -358,9 +397,9 @@ class TestAuthService:
             await redis_client.set(f"blacklist:session:{session_id}", "true", ex=3600)
             return True
 
-        result = await logout_session(session_id, self.mock_redis)
+        result = await logout_session(session_id, mock_redis)
 
         assert result is True
-        self.mock_redis.set.assert_called_once_with(
+        mock_redis.set.assert_called_once_with(
             f"blacklist:session:{session_id}", "true", ex=3600
         )